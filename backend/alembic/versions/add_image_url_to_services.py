@@ -1,7 +1,7 @@
 """add image url to services
 
 Revision ID: add_image_url_to_services
-Revises: f9334969cfe7
+Revises: create_core_tables
 Create Date: 2024-03-19 10:00:00.000000
 
 """
@@ -11,7 +11,7 @@ import sqlalchemy as sa
 
 # revision identifiers, used by Alembic.
 revision = 'add_image_url_to_services'
-down_revision = 'f9334969cfe7'
+down_revision = 'create_core_tables'
 branch_labels = None
 depends_on = None
 
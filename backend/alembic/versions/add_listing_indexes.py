@@ -0,0 +1,54 @@
+"""add composite indexes for listing queries
+
+Revision ID: add_listing_indexes
+Revises: add_service_search
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'add_listing_indexes'
+down_revision: Union[str, None] = 'add_service_search'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Each index matches one router query: the equality filter first, then the
+# (created_at, id) keyset the listing is ordered and paged by.
+INDEXES = [
+    ('ix_jobs_client_id_created_at_id', 'jobs', ['client_id', 'created_at', 'id'], None),
+    ('ix_messages_job_id_created_at_id', 'messages', ['job_id', 'created_at', 'id'], None),
+    ('ix_services_active_created_at_id', 'services', ['created_at', 'id'], 'is_active'),
+]
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block; building
+    # online keeps the tables writable while the indexes are populated.
+    with op.get_context().autocommit_block():
+        for name, table, columns, active_only in INDEXES:
+            where = None
+            if active_only:
+                where = sa.text('is_active' if dialect == 'postgresql' else 'is_active = 1')
+            op.create_index(
+                name, table, columns,
+                unique=False,
+                if_not_exists=True,
+                postgresql_concurrently=True,
+                postgresql_where=where,
+                sqlite_where=where,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(
+                name, table_name=table, if_exists=True, postgresql_concurrently=True
+            )
@@ -0,0 +1,75 @@
+"""add service full-text search
+
+Revision ID: add_service_search
+Revises: create_upload_blobs
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'add_service_search'
+down_revision: Union[str, None] = 'create_upload_blobs'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        # Weighted: title (A) ranks above category (B) above description (C)
+        op.execute("""
+            ALTER TABLE services ADD COLUMN search_vector tsvector
+            GENERATED ALWAYS AS (
+                setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+                setweight(to_tsvector('english', coalesce(category, '')), 'B') ||
+                setweight(to_tsvector('english', coalesce(description, '')), 'C')
+            ) STORED
+        """)
+        op.create_index(
+            'ix_services_search_vector', 'services', ['search_vector'],
+            unique=False, postgresql_using='gin'
+        )
+    elif dialect == 'sqlite':
+        op.execute("""
+            CREATE VIRTUAL TABLE services_fts USING fts5(
+                title, description, category, content='services', content_rowid='id'
+            )
+        """)
+        op.execute("""
+            CREATE TRIGGER services_fts_ai AFTER INSERT ON services BEGIN
+                INSERT INTO services_fts(rowid, title, description, category)
+                VALUES (new.id, new.title, new.description, new.category);
+            END
+        """)
+        op.execute("""
+            CREATE TRIGGER services_fts_ad AFTER DELETE ON services BEGIN
+                INSERT INTO services_fts(services_fts, rowid, title, description, category)
+                VALUES ('delete', old.id, old.title, old.description, old.category);
+            END
+        """)
+        op.execute("""
+            CREATE TRIGGER services_fts_au AFTER UPDATE ON services BEGIN
+                INSERT INTO services_fts(services_fts, rowid, title, description, category)
+                VALUES ('delete', old.id, old.title, old.description, old.category);
+                INSERT INTO services_fts(rowid, title, description, category)
+                VALUES (new.id, new.title, new.description, new.category);
+            END
+        """)
+        op.execute("INSERT INTO services_fts(services_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.drop_index('ix_services_search_vector', table_name='services')
+        op.drop_column('services', 'search_vector')
+    elif dialect == 'sqlite':
+        op.execute("DROP TRIGGER IF EXISTS services_fts_au")
+        op.execute("DROP TRIGGER IF EXISTS services_fts_ad")
+        op.execute("DROP TRIGGER IF EXISTS services_fts_ai")
+        op.execute("DROP TABLE IF EXISTS services_fts")
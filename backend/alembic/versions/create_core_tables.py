@@ -0,0 +1,83 @@
+"""create services, jobs and messages tables
+
+Revision ID: create_core_tables
+Revises: f9334969cfe7
+Create Date: 2024-03-19 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'create_core_tables'
+down_revision: Union[str, None] = 'f9334969cfe7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # These tables used to come only from Base.metadata.create_all, so databases
+    # built that way already have them; create just the ones that are missing.
+    # Columns and indexes added by later revisions are left to those revisions.
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if 'services' not in existing:
+        op.create_table('services',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('title', sa.String(), nullable=True),
+            sa.Column('description', sa.Text(), nullable=True),
+            sa.Column('price', sa.Integer(), nullable=True),
+            sa.Column('category', sa.String(), nullable=True),
+            sa.Column('owner_id', sa.Integer(), nullable=True),
+            sa.Column('is_active', sa.Boolean(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['owner_id'], ['users.id'], ),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_services_id'), 'services', ['id'], unique=False)
+        op.create_index(op.f('ix_services_title'), 'services', ['title'], unique=False)
+
+    if 'jobs' not in existing:
+        op.create_table('jobs',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('title', sa.String(), nullable=True),
+            sa.Column('description', sa.Text(), nullable=True),
+            sa.Column('status', sa.String(), nullable=True),
+            sa.Column('client_id', sa.Integer(), nullable=True),
+            sa.Column('service_id', sa.Integer(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['client_id'], ['users.id'], ),
+            sa.ForeignKeyConstraint(['service_id'], ['services.id'], ),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_jobs_id'), 'jobs', ['id'], unique=False)
+        op.create_index(op.f('ix_jobs_title'), 'jobs', ['title'], unique=False)
+
+    if 'messages' not in existing:
+        op.create_table('messages',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('content', sa.Text(), nullable=True),
+            sa.Column('sender_id', sa.Integer(), nullable=True),
+            sa.Column('job_id', sa.Integer(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['job_id'], ['jobs.id'], ),
+            sa.ForeignKeyConstraint(['sender_id'], ['users.id'], ),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_messages_id'), 'messages', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_messages_id'), table_name='messages')
+    op.drop_table('messages')
+    op.drop_index(op.f('ix_jobs_title'), table_name='jobs')
+    op.drop_index(op.f('ix_jobs_id'), table_name='jobs')
+    op.drop_table('jobs')
+    op.drop_index(op.f('ix_services_title'), table_name='services')
+    op.drop_index(op.f('ix_services_id'), table_name='services')
+    op.drop_table('services')
@@ -0,0 +1,35 @@
+"""create upload blobs
+
+Revision ID: create_upload_blobs
+Revises: add_image_url_to_services, create_project_tables
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'create_upload_blobs'
+# Also merges the two branches that both started from f9334969cfe7
+down_revision: Union[str, Sequence[str], None] = ('add_image_url_to_services', 'create_project_tables')
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('upload_blobs',
+        sa.Column('digest', sa.String(length=64), nullable=False),
+        sa.Column('path', sa.String(), nullable=False),
+        sa.Column('size', sa.Integer(), nullable=False),
+        sa.Column('ref_count', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('digest'),
+        sa.UniqueConstraint('path')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('upload_blobs')
@@ -0,0 +1,160 @@
+import asyncio
+from collections import deque
+import logging
+import os
+from typing import Deque, Dict, Optional
+
+from starlette.responses import JSONResponse
+
+from ..database import pool_limits
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+ADMISSION_CONTROL = os.getenv("ADMISSION_CONTROL", "true").lower() in ("1", "true", "yes")
+# How long a request may wait for a slot before it is shed; well under the
+# DB_POOL_TIMEOUT it would otherwise spend waiting for a connection
+ADMISSION_MAX_WAIT_SECONDS = float(os.getenv("ADMISSION_MAX_WAIT_SECONDS", "1"))
+ADMISSION_RETRY_AFTER = os.getenv("ADMISSION_RETRY_AFTER", "1")
+
+SAFE_METHODS = frozenset(("GET", "HEAD", "OPTIONS"))
+# Never queued or shed: probes must answer while the API is saturated, and
+# files are served without a database connection
+EXEMPT_PATHS = frozenset(("/", "/health", "/ready", "/metrics", "/docs", "/redoc", "/openapi.json"))
+EXEMPT_PREFIXES = ("/uploads/", "/images/")
+
+ADMISSION_REJECTED = registry.counter(
+    "admission_rejected_total", "Requests shed by admission control", ("lane",)
+)
+ADMISSION_ACTIVE = registry.gauge(
+    "admission_active", "Requests admitted and in progress", ("lane",)
+)
+ADMISSION_QUEUED = registry.gauge(
+    "admission_queued", "Requests waiting for admission", ("lane",)
+)
+
+class Lane:
+    """
+    A concurrency limit with a bounded FIFO wait queue. A freed slot is handed
+    straight to the oldest waiter; a request that finds the queue full, or
+    waits longer than `max_wait`, is refused.
+    """
+
+    def __init__(self, name: str, limit: int, queue_size: int, max_wait: float = ADMISSION_MAX_WAIT_SECONDS):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.max_wait = max_wait
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> bool:
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return True
+        if len(self._waiters) >= self.queue_size:
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.max_wait)
+        except asyncio.TimeoutError:
+            pass
+        except BaseException:
+            # Client went away; give back a slot handed over just before
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+        return waiter.done() and not waiter.cancelled()
+
+    def release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+def default_lanes() -> Dict[str, Lane]:
+    """
+    Lanes sized from the connection pool, each overridable with
+    ADMISSION_<LANE>_LIMIT and ADMISSION_<LANE>_QUEUE. Reads may use the whole
+    pool, writes half of it and exports, which hold a connection for the whole
+    download, a fifth. Auth has its own lane, so logins keep working while
+    the data lanes are saturated.
+    """
+    pool_size, max_overflow = pool_limits()
+    capacity = pool_size + max_overflow
+    defaults = {
+        "read": capacity,
+        "write": max(1, capacity // 2),
+        "export": max(1, capacity // 5),
+        "auth": 8,
+    }
+    lanes = {}
+    for name, limit in defaults.items():
+        limit = int(os.getenv(f"ADMISSION_{name.upper()}_LIMIT", str(limit)))
+        queue_size = int(os.getenv(f"ADMISSION_{name.upper()}_QUEUE", str(limit * 2)))
+        lanes[name] = Lane(name, limit, queue_size)
+    return lanes
+
+def lane_for(scope) -> Optional[str]:
+    """The lane a request is admitted through, or None when it is exempt."""
+    path = scope["path"]
+    if path in EXEMPT_PATHS or path.startswith(EXEMPT_PREFIXES):
+        return None
+    if path.startswith("/auth/"):
+        return "auth"
+    if path.endswith("/export"):
+        return "export"
+    if path.endswith("/stream"):
+        # Long-lived SSE feeds hold no connection while they wait for messages
+        return None
+    return "read" if scope["method"] in SAFE_METHODS else "write"
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware limiting how many requests of each lane run at once.
+    Requests beyond the limit wait briefly in a bounded queue; the rest are
+    answered at once with a 503 and Retry-After, so an overloaded worker
+    serves what it can at normal latency instead of timing everything out.
+    """
+
+    def __init__(self, app, lanes: Optional[Dict[str, Lane]] = None):
+        self.app = app
+        self.lanes = lanes if lanes is not None else default_lanes()
+        registry.add_collector(self.collect)
+
+    async def __call__(self, scope, receive, send):
+        lane = self.lanes.get(lane_for(scope)) if scope["type"] == "http" else None
+        if lane is None:
+            await self.app(scope, receive, send)
+            return
+
+        if not await lane.acquire():
+            ADMISSION_REJECTED.inc(lane.name)
+            logger.debug(f"Shed {scope['method']} {scope['path']}: {lane.name} lane saturated")
+            response = JSONResponse(
+                status_code=503,
+                content={"detail": "Server is busy, please retry"},
+                headers={"Retry-After": ADMISSION_RETRY_AFTER},
+            )
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            lane.release()
+
+    def collect(self) -> None:
+        for lane in self.lanes.values():
+            ADMISSION_ACTIVE.set(lane.active, lane.name)
+            ADMISSION_QUEUED.set(lane.queued, lane.name)
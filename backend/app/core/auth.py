@@ -1,14 +1,21 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Optional, Union
+from typing import Optional, Tuple, Union
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+import asyncio
+import functools
 import os
+import time
 from dotenv import load_dotenv
-from sqlalchemy.orm import Session
-from ..database import get_db
-from ..models.base import User
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..database import get_async_db
+from ..models.base import User, UserRole
+from .cache import TTLCache
 import logging
 
 logger = logging.getLogger(__name__)
@@ -19,16 +26,117 @@ load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing runs on its own bounded pool so bcrypt never blocks the event loop
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_QUEUE_LIMIT = int(os.getenv("PASSWORD_HASH_QUEUE_LIMIT", "64"))
+# Hashes below BCRYPT_MIN_ROUNDS are upgraded on the next successful login
+BCRYPT_MIN_ROUNDS = int(os.getenv("BCRYPT_MIN_ROUNDS", "12"))
+BCRYPT_MAX_ROUNDS = int(os.getenv("BCRYPT_MAX_ROUNDS", "15"))
+BCRYPT_TARGET_MS = float(os.getenv("BCRYPT_TARGET_MS", "250"))
+# Fixed cost factor; when unset the cost is calibrated at startup
+BCRYPT_ROUNDS = os.getenv("BCRYPT_ROUNDS")
+
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__min_rounds=BCRYPT_MIN_ROUNDS,
+    bcrypt__default_rounds=int(BCRYPT_ROUNDS or BCRYPT_MIN_ROUNDS),
+)
+_hash_executor = ThreadPoolExecutor(
+    max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash"
+)
+_pending_hash_jobs = 0
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
 
+# Detached User rows keyed by id, shared by every request on this worker
+user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL_SECONDS)
+
+@dataclass(frozen=True)
+class Principal:
+    """
+    Authenticated caller as described by the access token claims.
+    Building one needs no database access; use get_current_user when the
+    full User row is required.
+    """
+    id: int
+    username: str
+    role: UserRole
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+async def _run_hash_job(func, *args):
+    """
+    Run a password hashing call on the hashing pool. Once more than
+    PASSWORD_HASH_QUEUE_LIMIT calls are queued or running, new ones are
+    rejected with a 503 instead of piling up behind a login burst.
+    """
+    global _pending_hash_jobs
+    if _pending_hash_jobs >= PASSWORD_HASH_QUEUE_LIMIT:
+        logger.warning("Password hashing queue is full, rejecting request")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, please retry shortly",
+            headers={"Retry-After": "1"},
+        )
+    _pending_hash_jobs += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_hash_executor, functools.partial(func, *args))
+    finally:
+        _pending_hash_jobs -= 1
+
+async def hash_password(password: str) -> str:
+    return await _run_hash_job(get_password_hash, password)
+
+async def verify_and_update_password(
+    plain_password: str, hashed_password: str
+) -> Tuple[bool, Optional[str]]:
+    """
+    Check a password off the event loop. When the stored hash is valid but
+    stale (deprecated scheme or too few rounds) a replacement hash is
+    returned as the second element, otherwise None.
+    """
+    return await _run_hash_job(pwd_context.verify_and_update, plain_password, hashed_password)
+
+def calibrate_bcrypt_rounds(target_ms: float = BCRYPT_TARGET_MS) -> int:
+    """
+    Pick the highest bcrypt cost whose hash time on this host stays within
+    target_ms, bounded by BCRYPT_MIN_ROUNDS and BCRYPT_MAX_ROUNDS.
+    Each extra round doubles the cost, so only one hash is timed.
+    """
+    start = time.perf_counter()
+    pwd_context.hash("calibration", rounds=BCRYPT_MIN_ROUNDS)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    rounds = BCRYPT_MIN_ROUNDS
+    while rounds < BCRYPT_MAX_ROUNDS and elapsed_ms * 2 <= target_ms:
+        rounds += 1
+        elapsed_ms *= 2
+    return rounds
+
+async def configure_password_hashing() -> None:
+    """
+    Startup hook that applies the calibrated bcrypt cost unless BCRYPT_ROUNDS
+    pins it explicitly.
+    """
+    if BCRYPT_ROUNDS:
+        logger.info(f"Using configured bcrypt rounds: {BCRYPT_ROUNDS}")
+        return
+    try:
+        loop = asyncio.get_running_loop()
+        rounds = await loop.run_in_executor(_hash_executor, calibrate_bcrypt_rounds)
+    except Exception as e:
+        logger.error(f"bcrypt calibration failed, keeping defaults: {str(e)}")
+        return
+    pwd_context.update(bcrypt__default_rounds=rounds)
+    logger.info(f"Calibrated bcrypt rounds to {rounds} for a {BCRYPT_TARGET_MS:.0f} ms target")
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
     if expires_delta:
@@ -39,10 +147,58 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-) -> User:
+def token_claims(user: User) -> dict:
+    """
+    Claims embedded in access tokens so requests can be authorized without
+    reading the users table.
+    """
+    return {"sub": user.username, "uid": user.id, "role": user.role.value}
+
+def invalidate_user(user_id: int) -> None:
+    user_cache.pop(user_id)
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_cached_user(mapper, connection, target: User) -> None:
+    invalidate_user(target.id)
+
+async def load_user(db: AsyncSession, user_id: int) -> Optional[User]:
+    """
+    Return the User with the given id, served from the in-process cache when
+    possible. Cached rows are detached from any session and must be treated
+    as read-only.
+    """
+    user = user_cache.get(user_id)
+    if user is None:
+        user = await db.get(User, user_id)
+        if user is None:
+            return None
+        db.expunge(user)
+        user_cache.set(user_id, user)
+    return user
+
+def token_user_id(token: Optional[str]) -> Optional[int]:
+    """
+    The user id claim of a valid bearer token, or None. Never touches the
+    database, so it is cheap enough for middleware; legacy tokens without
+    the claim yield None.
+    """
+    if not token:
+        return None
+    if token.startswith('Bearer '):
+        token = token[7:]
+    try:
+        user_id = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]).get("uid")
+        return int(user_id) if user_id is not None else None
+    except (JWTError, ValueError, TypeError):
+        return None
+
+async def authenticate_token(token: str, db: AsyncSession) -> Principal:
+    """
+    Resolve a bearer token to a Principal, raising a 401 HTTPException if it is
+    invalid. Shared by the HTTP dependency and the streaming endpoints, which
+    receive their token as a query parameter.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -52,25 +208,50 @@ async def get_current_user(
         # Remove 'Bearer ' prefix if present
         if token.startswith('Bearer '):
             token = token[7:]
-            
+
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: Optional[str] = payload.get("sub")
-        if username is None:
-            logger.error("No username in token payload")
-            raise credentials_exception
-        
-        user = db.query(User).filter(User.username == username).first()
-        if user is None:
-            logger.error(f"User not found for username: {username}")
-            raise credentials_exception
-            
-        return user
     except JWTError as e:
         logger.error(f"JWT validation error: {str(e)}")
         raise credentials_exception
-    except Exception as e:
-        logger.error(f"Unexpected error in get_current_user: {str(e)}")
+
+    username: Optional[str] = payload.get("sub")
+    if username is None:
+        logger.error("No username in token payload")
+        raise credentials_exception
+
+    user_id = payload.get("uid")
+    role = payload.get("role")
+    if user_id is not None and role is not None:
+        try:
+            return Principal(id=int(user_id), username=username, role=UserRole(role))
+        except ValueError:
+            logger.error(f"Malformed claims in token for username: {username}")
+            raise credentials_exception
+
+    # Tokens issued before claims were added only carry the username
+    result = await db.execute(select(User).where(User.username == username))
+    user = result.scalars().first()
+    if user is None:
+        logger.error(f"User not found for username: {username}")
+        raise credentials_exception
+    return Principal(id=user.id, username=user.username, role=user.role)
+
+async def get_current_principal(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db)
+) -> Principal:
+    return await authenticate_token(token, db)
+
+async def get_current_user(
+    principal: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_async_db)
+) -> User:
+    user = await load_user(db, principal.id)
+    if user is None:
+        logger.error(f"User not found for id: {principal.id}")
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Internal server error during authentication"
-        ) 
\ No newline at end of file
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return user
@@ -0,0 +1,19 @@
+from typing import List, Optional, Sequence
+
+from fastapi import HTTPException, status
+
+def parse_expand(expand: Optional[str], allowed: Sequence[str]) -> List[str]:
+    """
+    Split a comma separated `expand` query value into relation names.
+    Raises a 400 naming the allowed relations if any name is unknown.
+    """
+    if not expand:
+        return []
+    names = list(dict.fromkeys(name.strip() for name in expand.split(",") if name.strip()))
+    unknown = [name for name in names if name not in allowed]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Cannot expand {', '.join(unknown)}; expected one of: {', '.join(allowed)}"
+        )
+    return names
@@ -1,48 +1,89 @@
 import os
 from fastapi import UploadFile
-from pathlib import Path
+from fastapi.concurrency import run_in_threadpool
+import hashlib
 import logging
+import tempfile
 from typing import Optional
-import uuid
+from sqlalchemy.ext.asyncio import AsyncSession
 
-logger = logging.getLogger(__name__)
+from .storage import UPLOAD_DIR, store_blob
 
-# Get the absolute path to the uploads directory
-BASE_DIR = Path(__file__).parent.parent.parent
-UPLOAD_DIR = BASE_DIR / "uploads"
-UPLOAD_DIR.mkdir(exist_ok=True)
+logger = logging.getLogger(__name__)
 
 ALLOWED_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif'}
 MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
+CHUNK_SIZE = 64 * 1024  # 64KB, bounds the memory held per upload
+
+# Leading bytes of each accepted image format and the extension it is stored with
+MAGIC_NUMBERS = (
+    (b"\xff\xd8\xff", ".jpg"),
+    (b"\x89PNG\r\n\x1a\n", ".png"),
+    (b"GIF87a", ".gif"),
+    (b"GIF89a", ".gif"),
+)
 
-async def save_uploaded_file(file: UploadFile) -> Optional[str]:
+def sniff_extension(head: bytes) -> Optional[str]:
     """
-    Save an uploaded file to the uploads directory and return the relative path.
+    Return the extension matching the magic bytes at the start of a file,
+    or None if the content is not an accepted image format.
+    """
+    for magic, extension in MAGIC_NUMBERS:
+        if head.startswith(magic):
+            return extension
+    return None
+
+def _discard(path: str) -> None:
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+async def save_uploaded_file(file: UploadFile, db: AsyncSession) -> Optional[str]:
+    """
+    Stream an uploaded file into the content-addressed upload store and return its relative path.
+    The upload is read in CHUNK_SIZE pieces, hashed and written to a temporary file off
+    the event loop, then atomically renamed into place under its SHA-256, or dropped if
+    identical content is already stored. The format is taken from the file's magic bytes
+    rather than its name.
     Returns None if the file is invalid or saving fails.
     """
+    tmp = None
     try:
-        # Validate file extension
-        file_extension = Path(file.filename).suffix.lower()
+        head = await file.read(CHUNK_SIZE)
+        file_extension = sniff_extension(head)
         if file_extension not in ALLOWED_EXTENSIONS:
-            logger.error(f"Invalid file extension: {file_extension}")
+            logger.error(f"Unrecognized image content for upload: {file.filename}")
             return None
 
-        # Generate a unique filename
-        unique_filename = f"{uuid.uuid4()}{file_extension}"
-        file_path = UPLOAD_DIR / unique_filename
-
-        # Save the file
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            # Validate file size
-            if len(content) > MAX_FILE_SIZE:
-                logger.error(f"File too large: {len(content)} bytes")
+        tmp = await run_in_threadpool(
+            tempfile.NamedTemporaryFile, dir=UPLOAD_DIR, prefix=".upload-", delete=False
+        )
+        size = 0
+        digest = hashlib.sha256()
+        chunk = head
+        while chunk:
+            size += len(chunk)
+            # Validate file size before anything past the limit is written
+            if size > MAX_FILE_SIZE:
+                logger.error(f"File too large: more than {MAX_FILE_SIZE} bytes")
                 return None
-            buffer.write(content)
+            digest.update(chunk)
+            await run_in_threadpool(tmp.write, chunk)
+            chunk = await file.read(CHUNK_SIZE)
+        await run_in_threadpool(tmp.close)
 
-        # Return the relative path for database storage
-        return f"/uploads/{unique_filename}"
+        # Name the file by its content and move it into place
+        tmp_path, tmp = tmp.name, None
+        try:
+            return await store_blob(db, tmp_path, digest.hexdigest(), file_extension, size)
+        finally:
+            await run_in_threadpool(_discard, tmp_path)
 
     except Exception as e:
         logger.error(f"Error saving file: {str(e)}")
-        return None 
\ No newline at end of file
+        return None
+    finally:
+        if tmp is not None:
+            tmp.close()
+            await run_in_threadpool(_discard, tmp.name)
@@ -0,0 +1,113 @@
+import logging
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from PIL import Image, ImageOps
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .file_upload import UPLOAD_DIR
+from .tasks import enqueue, task
+
+logger = logging.getLogger(__name__)
+
+# Widths of the resized variants generated for every uploaded image
+DERIVATIVE_WIDTHS = tuple(
+    sorted(int(w) for w in os.getenv("IMAGE_DERIVATIVE_WIDTHS", "320,640,1280").split(","))
+)
+THUMBNAIL_WIDTH = DERIVATIVE_WIDTHS[0]
+# How many derivative tasks each task worker process runs at once
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+
+DERIVATIVES_TASK = "images.derivatives"
+
+# Variant formats in order of preference, with the MIME type a client must accept.
+# AVIF is only produced when the installed Pillow can encode it.
+DERIVATIVE_FORMATS = [("webp", "image/webp")]
+Image.init()
+if "AVIF" in Image.SAVE:
+    DERIVATIVE_FORMATS.insert(0, ("avif", "image/avif"))
+
+def derivative_path(original: Path, width: int, fmt: str) -> Path:
+    return original.with_name(f"{original.stem}.w{width}.{fmt}")
+
+def upload_path(image_url: str) -> Optional[Path]:
+    """
+    Map an /uploads/... URL to its file, refusing paths outside UPLOAD_DIR.
+    """
+    if not image_url or not image_url.startswith("/uploads/"):
+        return None
+    path = (UPLOAD_DIR / image_url[len("/uploads/"):]).resolve()
+    if UPLOAD_DIR.resolve() not in path.parents:
+        return None
+    return path
+
+def thumbnail_url(image_url: Optional[str], width: int = THUMBNAIL_WIDTH) -> Optional[str]:
+    """
+    Size-negotiated URL for an uploaded image; the format is chosen from the
+    client's Accept header when the URL is fetched.
+    """
+    if not image_url or not image_url.startswith("/uploads/"):
+        return image_url
+    return f"/images/{image_url[len('/uploads/'):]}?w={width}"
+
+def generate_derivatives(path: str) -> List[str]:
+    """
+    Write every configured width/format variant of the image at `path` next to it.
+    Runs in a task worker, off the event loop; each variant is written to a temporary name
+    and renamed so readers never see a partial file.
+    """
+    original = Path(path)
+    written = []
+    with Image.open(original) as im:
+        im = ImageOps.exif_transpose(im)
+        if im.mode not in ("RGB", "RGBA"):
+            im = im.convert("RGBA" if "transparency" in im.info or im.mode in ("LA", "P") else "RGB")
+        for width in DERIVATIVE_WIDTHS:
+            resized = im.copy()
+            if resized.width > width:
+                resized.thumbnail((width, resized.height * width // resized.width + 1))
+            for fmt, _ in DERIVATIVE_FORMATS:
+                target = derivative_path(original, width, fmt)
+                tmp = target.with_name(f".{target.name}.tmp")
+                resized.save(tmp, format=fmt.upper(), quality=80)
+                os.replace(tmp, target)
+                written.append(str(target))
+    return written
+
+@task(DERIVATIVES_TASK, concurrency=IMAGE_WORKERS, timeout=300)
+async def build_derivatives(payload: Dict[str, Any]) -> None:
+    path = upload_path(payload["url"])
+    if path is None or not path.exists():
+        # Replaced and collected before the task ran; nothing left to do
+        return
+    await run_in_threadpool(generate_derivatives, str(path))
+
+def enqueue_derivatives(db: AsyncSession, image_url: Optional[str]) -> None:
+    """
+    Queue derivative generation for an uploaded image in the caller's
+    transaction; a task worker builds the variants. Until they exist,
+    negotiated URLs serve the original.
+    """
+    if upload_path(image_url) is None:
+        return
+    enqueue(db, DERIVATIVES_TASK, {"url": image_url})
+
+def select_variant(original: Path, width: Optional[int], accept: str) -> Path:
+    """
+    Pick the best existing file for a requested width and Accept header: the
+    smallest derivative at least `width` wide in the most preferred accepted
+    format, falling back to the original.
+    """
+    if width is None:
+        return original
+    candidates = [w for w in DERIVATIVE_WIDTHS if w >= width] or [DERIVATIVE_WIDTHS[-1]]
+    accept = accept or ""
+    for fmt, mime in DERIVATIVE_FORMATS:
+        if mime not in accept:
+            continue
+        path = derivative_path(original, candidates[0], fmt)
+        if path.exists():
+            return path
+    return original
@@ -0,0 +1,43 @@
+from typing import Any, NoReturn
+
+from fastapi import HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.base import Job, Service
+
+async def raise_for_miss(db: AsyncSession, model: Any, row_id: int, noun: str, action: str) -> NoReturn:
+    """
+    A write conditioned on ownership (WHERE id = ? AND owner = ?) matched no
+    row. Roll it back and tell the two causes apart: 404 when the row does not
+    exist, 403 when it belongs to someone else. Only this failure path pays
+    for the extra lookup.
+    """
+    await db.rollback()
+    found = await db.scalar(select(model.id).where(model.id == row_id))
+    if found is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"{noun} not found")
+    raise HTTPException(
+        status_code=status.HTTP_403_FORBIDDEN,
+        detail=f"Not authorized to {action} this {noun.lower()}"
+    )
+
+async def ensure_job_participant(db: AsyncSession, job_id: int, user_id: int) -> None:
+    """
+    Allow only the two sides of a job, its client and the owner of the
+    service it was booked on, to read its messages: 404 when the job does
+    not exist, 403 for anyone else.
+    """
+    result = await db.execute(
+        select(Job.client_id, Service.owner_id)
+        .outerjoin(Service, Service.id == Job.service_id)
+        .where(Job.id == job_id)
+    )
+    row = result.first()
+    if row is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    if user_id not in (row.client_id, row.owner_id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to view messages of this job"
+        )
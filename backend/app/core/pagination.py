@@ -0,0 +1,95 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Callable, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Response, status
+from sqlalchemy import Select, tuple_
+
+# Response header carrying the cursor for the next page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+# Largest page a listing will return; endpoints declare it as the bound of `limit`
+MAX_PAGE_SIZE = 500
+
+def encode_cursor(*values: Any) -> str:
+    """
+    Encode the sort key of the last row of a page as an opaque, URL-safe cursor.
+    Datetimes are stored as ISO strings and restored by decode_cursor.
+    """
+    key = [{"dt": v.isoformat()} if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(key, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def _cursor_value(value: Any, expected: type) -> Any:
+    # bool is an int subclass, but never a valid sort key
+    if expected is datetime:
+        if not isinstance(value, dict) or not isinstance(value.get("dt"), str):
+            raise ValueError("expected a datetime")
+        return datetime.fromisoformat(value["dt"])
+    if isinstance(value, bool):
+        raise ValueError("unexpected boolean")
+    if expected is float and isinstance(value, (int, float)):
+        return float(value)
+    if expected is int and isinstance(value, int):
+        return value
+    raise ValueError(f"expected {expected.__name__}")
+
+def decode_cursor(cursor: str, types: Sequence[type] = (datetime, int)) -> Tuple[Any, ...]:
+    """
+    Decode a cursor produced by encode_cursor whose values are of `types`,
+    one per sort column (datetime, int or float).
+    Raises a 400 if the cursor is malformed or its values do not match, so
+    they never reach the database driver.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        key = json.loads(raw)
+        if not isinstance(key, list) or len(key) != len(types):
+            raise ValueError("unexpected cursor shape")
+        return tuple(_cursor_value(value, expected) for value, expected in zip(key, types))
+    except (ValueError, TypeError, KeyError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+def paginate(
+    stmt: Select,
+    model: Any,
+    limit: int,
+    cursor: Optional[str] = None,
+    skip: int = 0,
+) -> Select:
+    """
+    Order a listing by (created_at, id) and apply either a keyset seek from
+    `cursor` or, for older clients, the legacy `skip` offset.
+    One extra row is fetched so the caller can tell whether a next page exists.
+    """
+    stmt = stmt.order_by(model.created_at, model.id)
+    if cursor:
+        created_at, last_id = decode_cursor(cursor)
+        stmt = stmt.where(tuple_(model.created_at, model.id) > tuple_(created_at, last_id))
+    elif skip:
+        stmt = stmt.offset(skip)
+    return stmt.limit(limit + 1)
+
+def page_rows(
+    rows: Sequence[Any],
+    limit: int,
+    response: Response,
+    key: Callable[[Any], Tuple[Any, ...]] = lambda row: (row.created_at, row.id),
+) -> Sequence[Any]:
+    """
+    Trim the look-ahead row fetched by paginate and, when there are more rows,
+    expose the cursor of the next page in the X-Next-Cursor header.
+    `key` returns the sort key the cursor is built from.
+    """
+    if limit < 1:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="limit must be at least 1"
+        )
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(*key(rows[-1]))
+    return rows
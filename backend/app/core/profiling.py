@@ -0,0 +1,121 @@
+from collections import Counter
+import logging
+import os
+import re
+import time
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .metrics import current_request_stats, route_label
+
+logger = logging.getLogger(__name__)
+
+# Statements slower than this are logged with the route that issued them
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+# The same statement shape this many times in one request is reported as N+1
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "10"))
+# Adds X-DB-Queries / X-DB-Time to every response
+DEBUG = os.getenv("DEBUG", "").lower() in ("1", "true", "yes")
+
+# Expanded IN lists differ only in their number of placeholders
+IN_LIST_RE = re.compile(
+    r"\bIN\s*\((?:\s*(?:\?|%s|\$\d+|%\(\w+\)s|:\w+)\s*,)+\s*(?:\?|%s|\$\d+|%\(\w+\)s|:\w+)\s*\)",
+    re.IGNORECASE,
+)
+WHITESPACE_RE = re.compile(r"\s+")
+MAX_LOGGED_SQL = 1000
+
+def statement_shape(statement: str) -> str:
+    """SQL with whitespace collapsed and IN lists reduced to one placeholder."""
+    return IN_LIST_RE.sub("IN (?...)", WHITESPACE_RE.sub(" ", statement).strip())
+
+def parameters_shape(parameters: Any, executemany: bool) -> str:
+    """
+    Describe bound parameters by type only, e.g. "(int, str)" or "3 x {email: str}",
+    so logs never carry user data.
+    """
+    if executemany:
+        rows = list(parameters or ())
+        return f"{len(rows)} x {parameters_shape(rows[0], False)}" if rows else "[]"
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{k}: {type(v).__name__}" for k, v in parameters.items()) + "}"
+    if isinstance(parameters, (list, tuple)):
+        return "(" + ", ".join(type(v).__name__ for v in parameters) + ")"
+    return type(parameters).__name__
+
+def _origin() -> str:
+    stats = current_request_stats()
+    if stats is None:
+        return "outside a request"
+    return f"{stats.scope.get('method', '')} {route_label(stats.scope)}".strip()
+
+def install_profiler(engine: Engine) -> None:
+    """
+    Log statements on `engine` (for an AsyncEngine, its sync_engine) slower
+    than SLOW_QUERY_MS, and flag statement shapes repeated at least
+    N_PLUS_ONE_THRESHOLD times within one request.
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("profile_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed_ms = (time.perf_counter() - conn.info["profile_start"].pop()) * 1000
+        shape = None
+
+        if elapsed_ms >= SLOW_QUERY_MS:
+            shape = statement_shape(statement)
+            logger.warning(
+                f"Slow query ({elapsed_ms:.1f} ms) from {_origin()}: {shape[:MAX_LOGGED_SQL]} "
+                f"params={parameters_shape(parameters, executemany)}"
+            )
+
+        stats = current_request_stats()
+        if stats is None:
+            return
+        shapes = stats.extra.setdefault("statement_shapes", Counter())
+        shape = shape or statement_shape(statement)
+        shapes[shape] += 1
+        if shapes[shape] == N_PLUS_ONE_THRESHOLD:
+            logger.warning(
+                f"Possible N+1 in {_origin()}: statement ran {N_PLUS_ONE_THRESHOLD} times "
+                f"in one request: {shape[:MAX_LOGGED_SQL]}"
+            )
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(exception_context):
+        conn = exception_context.connection
+        starts = conn.info.get("profile_start") if conn is not None else None
+        if starts:
+            starts.pop()
+
+class QueryHeadersMiddleware:
+    """
+    Debug-only ASGI middleware reporting the SQL cost of each request in
+    X-DB-Queries and X-DB-Time (milliseconds). Must sit inside
+    MetricsMiddleware, which collects the numbers.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                stats = current_request_stats()
+                if stats is not None:
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"x-db-queries", str(stats.queries).encode()),
+                        (b"x-db-time", f"{stats.db_seconds * 1000:.2f}".encode()),
+                    ]
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,61 @@
+import asyncio
+from collections import defaultdict
+import logging
+from typing import Any, Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+SUBSCRIBER_QUEUE_SIZE = 256
+
+class Subscription:
+    """
+    One live listener on a job's message stream. A None item on the queue means
+    the subscriber fell too far behind and must reconnect and resume.
+    """
+
+    def __init__(self, job_id: int, maxsize: int = SUBSCRIBER_QUEUE_SIZE):
+        self.job_id = job_id
+        self.queue: "asyncio.Queue[Optional[Dict[str, Any]]]" = asyncio.Queue(maxsize=maxsize)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Next message, raising asyncio.TimeoutError after `timeout` seconds."""
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+class JobMessageHub:
+    """
+    In-process pub/sub that fans new job messages out to every WebSocket/SSE
+    subscriber of that job on this worker. Delivery never blocks the
+    publisher: a subscriber whose queue is full is dropped and told to resume
+    from the last message id it saw.
+    """
+
+    def __init__(self):
+        self._subscriptions: Dict[int, Set[Subscription]] = defaultdict(set)
+
+    def subscribe(self, job_id: int) -> Subscription:
+        subscription = Subscription(job_id)
+        self._subscriptions[job_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscriptions = self._subscriptions.get(subscription.job_id)
+        if subscriptions is None:
+            return
+        subscriptions.discard(subscription)
+        if not subscriptions:
+            del self._subscriptions[subscription.job_id]
+
+    def publish(self, job_id: int, message: Dict[str, Any]) -> None:
+        for subscription in list(self._subscriptions.get(job_id, ())):
+            try:
+                subscription.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                logger.warning(f"Dropping slow subscriber on job {job_id}")
+                self.unsubscribe(subscription)
+                subscription.queue.get_nowait()
+                subscription.queue.put_nowait(None)
+
+    def subscriber_count(self, job_id: int) -> int:
+        return len(self._subscriptions.get(job_id, ()))
+
+hub = JobMessageHub()
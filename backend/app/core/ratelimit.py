@@ -0,0 +1,204 @@
+from dataclasses import dataclass
+import logging
+import math
+import os
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Request, status
+
+from .cache import TTLCache
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMITING = os.getenv("RATE_LIMITING", "true").lower() in ("1", "true", "yes")
+# Shared buckets for all workers; without it each worker enforces its own copy
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL")
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+RATE_LIMIT_PURGE_SECONDS = float(os.getenv("RATE_LIMIT_PURGE_SECONDS", "60"))
+
+RATE_LIMITED = registry.counter(
+    "rate_limited_total", "Requests refused by a rate limit", ("action", "scope")
+)
+
+@dataclass(frozen=True)
+class Rule:
+    """A token bucket: bursts of up to `capacity`, refilled in full every `period` seconds."""
+    capacity: int
+    period: float
+
+    @property
+    def rate(self) -> float:
+        return self.capacity / self.period
+
+def _rule(name: str, default: str) -> Rule:
+    # RATE_LIMIT_<NAME>="<count>/<seconds>"
+    count, seconds = os.getenv(f"RATE_LIMIT_{name}", default).split("/")
+    return Rule(int(count), float(seconds))
+
+# Buckets per action, keyed by client IP, by account, or by both
+RATE_LIMITS: Dict[str, Dict[str, Rule]] = {
+    "login": {"ip": _rule("LOGIN_IP", "20/60")},
+    # Wrong passwords, charged only when verification fails and keyed by
+    # account and IP together, so guessing from elsewhere cannot lock the
+    # owner out of their own account
+    "login_failure": {"account_ip": _rule("LOGIN_FAILURE", "10/300")},
+    "register": {"ip": _rule("REGISTER_IP", "10/3600")},
+    "create_job": {"ip": _rule("CREATE_JOB_IP", "60/60"), "account": _rule("CREATE_JOB_ACCOUNT", "20/60")},
+    "create_message": {
+        "ip": _rule("CREATE_MESSAGE_IP", "120/60"),
+        "account": _rule("CREATE_MESSAGE_ACCOUNT", "60/60"),
+    },
+}
+
+Bucket = Tuple[str, Rule]
+
+class MemoryBackend:
+    """
+    Buckets in a bounded in-process LRU. A bucket is stored as (tokens, time)
+    and expires when it would have refilled, so a missing bucket is simply a
+    full one: each take is O(1), and idle keys cost nothing once the periodic
+    purge has dropped them.
+    """
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self._buckets = TTLCache(maxsize=max_keys)
+        self._next_purge = 0.0
+
+    async def take(self, buckets: Sequence[Bucket], cost: int = 1, spend: bool = True) -> List[float]:
+        """
+        Spend `cost` tokens from every bucket, or from none if any is short.
+        Returns, per bucket, 0 or the seconds until it holds `cost` tokens.
+        With spend=False the buckets are only checked.
+        """
+        now = time.monotonic()
+        levels = []
+        for key, rule in buckets:
+            tokens, updated_at = self._buckets.get(key, (rule.capacity, now))
+            levels.append(min(rule.capacity, tokens + (now - updated_at) * rule.rate))
+        waits = [max(0.0, (cost - tokens) / rule.rate) for tokens, (_, rule) in zip(levels, buckets)]
+        if spend and not any(waits):
+            for tokens, (key, rule) in zip(levels, buckets):
+                tokens -= cost
+                self._buckets.set(key, (tokens, now), ttl=(rule.capacity - tokens) / rule.rate)
+        if now >= self._next_purge:
+            self._buckets.purge()
+            self._next_purge = now + RATE_LIMIT_PURGE_SECONDS
+        return waits
+
+# Same algorithm, atomic in Redis and timed by the Redis clock. ARGV holds
+# the cost, the spend flag, then capacity and rate for each key. Waits are
+# returned as strings, since Redis truncates Lua numbers to integers.
+TOKEN_BUCKET_SCRIPT = """
+local cost = tonumber(ARGV[1])
+local spend = ARGV[2] == '1'
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local levels = {}
+local waits = {}
+local refused = false
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[1 + 2 * i])
+    local rate = tonumber(ARGV[2 + 2 * i])
+    local state = redis.call('HMGET', key, 'tokens', 'updated_at')
+    local tokens = tonumber(state[1]) or capacity
+    local updated_at = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + (now - updated_at) * rate)
+    levels[i] = tokens
+    if tokens < cost then
+        waits[i] = tostring((cost - tokens) / rate)
+        refused = true
+    else
+        waits[i] = '0'
+    end
+end
+if spend and not refused then
+    for i, key in ipairs(KEYS) do
+        local capacity = tonumber(ARGV[1 + 2 * i])
+        local rate = tonumber(ARGV[2 + 2 * i])
+        local tokens = levels[i] - cost
+        redis.call('HSET', key, 'tokens', tostring(tokens), 'updated_at', tostring(now))
+        redis.call('PEXPIRE', key, math.ceil((capacity - tokens) / rate * 1000) + 1000)
+    end
+end
+return waits
+"""
+
+class RedisBackend:
+    """
+    Buckets shared by every worker through Redis. Needs the redis package
+    (pip install redis), imported only when RATE_LIMIT_REDIS_URL is set.
+    If Redis is unreachable requests are allowed, not refused.
+    """
+
+    def __init__(self, url: str):
+        import redis.asyncio as redis
+
+        self._client = redis.from_url(url)
+        self._script = self._client.register_script(TOKEN_BUCKET_SCRIPT)
+
+    async def take(self, buckets: Sequence[Bucket], cost: int = 1, spend: bool = True) -> List[float]:
+        args: List[Any] = [cost, 1 if spend else 0]
+        for _, rule in buckets:
+            args += [rule.capacity, rule.rate]
+        try:
+            waits = await self._script(keys=[f"ratelimit:{key}" for key, _ in buckets], args=args)
+        except Exception as e:
+            logger.warning(f"Rate limit backend unavailable, allowing request: {str(e)}")
+            return [0.0] * len(buckets)
+        return [float(wait) for wait in waits]
+
+_backend: Optional[Any] = None
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        _backend = RedisBackend(RATE_LIMIT_REDIS_URL) if RATE_LIMIT_REDIS_URL else MemoryBackend()
+    return _backend
+
+def client_ip(request: Request) -> str:
+    # The peer address; behind a proxy run uvicorn with --proxy-headers and
+    # --forwarded-allow-ips so it is the real client, not the proxy
+    return request.client.host if request.client else "unknown"
+
+def _buckets(request: Request, action: str, account: Any) -> List[Tuple[str, str, Rule]]:
+    ip = client_ip(request)
+    subjects = {"ip": ip}
+    if account is not None:
+        subjects["account"] = str(account)
+        subjects["account_ip"] = f"{account}|{ip}"
+    return [
+        (scope, f"{action}:{scope}:{subjects[scope]}", rule)
+        for scope, rule in RATE_LIMITS[action].items()
+        if scope in subjects
+    ]
+
+async def check_rate_limit(request: Request, action: str, account: Any = None, spend: bool = True) -> None:
+    """
+    Spend a token from each bucket of `action`: the client IP's and, when
+    `account` is given, the account's. Every bucket is checked before any is
+    spent, so a refused request costs nothing. Raises a 429 with Retry-After
+    when one is empty. Call it before any expensive work such as bcrypt;
+    with spend=False it only checks, for limits charged by record_attempt.
+    """
+    if not RATE_LIMITING:
+        return
+    buckets = _buckets(request, action, account)
+    waits = await get_backend().take([(key, rule) for _, key, rule in buckets], spend=spend)
+    refused = [(scope, wait) for (scope, _, _), wait in zip(buckets, waits) if wait > 0]
+    if refused:
+        for scope, _ in refused:
+            RATE_LIMITED.inc(action, scope)
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many requests, please retry later",
+            headers={"Retry-After": str(math.ceil(max(wait for _, wait in refused)))},
+        )
+
+async def record_attempt(request: Request, action: str, account: Any = None) -> None:
+    """Charge the buckets of `action` for an attempt that already ran, such as a failed login."""
+    if not RATE_LIMITING:
+        return
+    buckets = _buckets(request, action, account)
+    await get_backend().take([(key, rule) for _, key, rule in buckets])
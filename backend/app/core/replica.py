@@ -0,0 +1,113 @@
+import hashlib
+import hmac
+import math
+import os
+import time
+from typing import AsyncIterator, Optional
+
+from fastapi import Request
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from ..database import AsyncSessionLocal, ReplicaSessionLocal
+from .auth import SECRET_KEY, token_user_id
+from .cache import TTLCache
+
+# After a successful write, that user's reads stay on the primary this long;
+# it should exceed the replica's usual replication lag
+REPLICA_STICKY_SECONDS = float(os.getenv("REPLICA_STICKY_SECONDS", "5"))
+REPLICA_STICKY_MAX_USERS = int(os.getenv("REPLICA_STICKY_MAX_USERS", "100000"))
+# recent_writers only covers the worker that served the write. The cookie
+# carries the write to the client, so any worker or host sharing SECRET_KEY
+# honours it; clients must send cookies (the frontend uses withCredentials).
+REPLICA_STICKY_COOKIE = os.getenv("REPLICA_STICKY_COOKIE", "primary_until")
+# "none" when the API and the frontend are on different sites (then also Secure)
+REPLICA_STICKY_SAMESITE = os.getenv("REPLICA_STICKY_SAMESITE", "lax").lower()
+
+SAFE_METHODS = frozenset(("GET", "HEAD", "OPTIONS"))
+
+recent_writers = TTLCache(maxsize=REPLICA_STICKY_MAX_USERS, ttl=REPLICA_STICKY_SECONDS)
+
+def mark_recent_write(user_id: Optional[int]) -> None:
+    if user_id is not None:
+        recent_writers.set(user_id, True)
+
+def recently_wrote(user_id: Optional[int]) -> bool:
+    return user_id is not None and recent_writers.get(user_id, False)
+
+def _sign(payload: str) -> str:
+    return hmac.new(SECRET_KEY.encode(), f"replica:{payload}".encode(), hashlib.sha256).hexdigest()[:32]
+
+def sticky_cookie(user_id: int) -> str:
+    """Set-Cookie value pinning `user_id` to the primary for REPLICA_STICKY_SECONDS."""
+    payload = f"{user_id}.{int(time.time() + REPLICA_STICKY_SECONDS)}"
+    cookie = (
+        f"{REPLICA_STICKY_COOKIE}={payload}.{_sign(payload)}; "
+        f"Max-Age={math.ceil(REPLICA_STICKY_SECONDS)}; Path=/; HttpOnly; SameSite={REPLICA_STICKY_SAMESITE}"
+    )
+    return cookie + "; Secure" if REPLICA_STICKY_SAMESITE == "none" else cookie
+
+def sticky_cookie_valid(value: Optional[str], user_id: Optional[int]) -> bool:
+    """Whether a cookie from sticky_cookie still pins `user_id` to the primary."""
+    if not value or user_id is None:
+        return False
+    payload, _, signature = value.rpartition(".")
+    owner, _, until = payload.partition(".")
+    if not hmac.compare_digest(signature, _sign(payload)) or owner != str(user_id):
+        return False
+    try:
+        return int(until) >= time.time()
+    except ValueError:
+        return False
+
+def _authorization(headers) -> Optional[str]:
+    for name, value in headers:
+        if name == b"authorization":
+            return value.decode("latin-1")
+    return None
+
+class ReplicaStickinessMiddleware:
+    """
+    Remembers which users just wrote, so get_read_db keeps serving their reads
+    from the primary until the replica has caught up. A user is marked as the
+    successful response starts, before the client can issue a follow-up read:
+    in this worker's recent_writers and with a signed cookie that any other
+    worker checks in its place.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in SAFE_METHODS or ReplicaSessionLocal is None:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                user_id = token_user_id(_authorization(scope["headers"]))
+                if user_id is not None:
+                    mark_recent_write(user_id)
+                    headers = list(message.get("headers", []))
+                    headers.append((b"set-cookie", sticky_cookie(user_id).encode("latin-1")))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+def read_session_factory(request: Request) -> async_sessionmaker:
+    """
+    Where read-only work for `request` goes: the replica when one is configured
+    and the caller has not written within REPLICA_STICKY_SECONDS, else the primary.
+    """
+    if ReplicaSessionLocal is None:
+        return AsyncSessionLocal
+    user_id = token_user_id(request.headers.get("authorization"))
+    use_primary = recently_wrote(user_id) or sticky_cookie_valid(
+        request.cookies.get(REPLICA_STICKY_COOKIE), user_id
+    )
+    return AsyncSessionLocal if use_primary else ReplicaSessionLocal
+
+async def get_read_db(request: Request) -> AsyncIterator[AsyncSession]:
+    """Session for read-only endpoints, from read_session_factory."""
+    async with read_session_factory(request)() as db:
+        yield db
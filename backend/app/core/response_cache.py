@@ -0,0 +1,156 @@
+from collections import OrderedDict
+from dataclasses import dataclass, field
+import hashlib
+import os
+from threading import Lock
+import time
+from typing import Dict, FrozenSet, Iterable, Optional, Set
+
+from fastapi import Request
+from starlette.datastructures import Headers
+from starlette.responses import Response
+
+from .static import is_not_modified
+
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "2048"))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+# Bounds how stale another worker's copy can be, since invalidation is per process
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "30"))
+
+@dataclass
+class CachedResponse:
+    """
+    A serialized JSON response plus what it depends on: the ids of the rows it
+    contains, whether it is the last page of a listing (new rows land there),
+    and whether it was addressed by offset (any insert or delete shifts it).
+    """
+    body: bytes
+    etag: str
+    headers: Dict[str, str] = field(default_factory=dict)
+    ids: FrozenSet[int] = frozenset()
+    tail: bool = False
+    positional: bool = False
+    expires_at: float = 0.0
+
+    def to_response(self, request: Request) -> Response:
+        headers = {
+            "ETag": self.etag,
+            "Cache-Control": "no-cache",
+            **self.headers,
+        }
+        if is_not_modified(Headers(headers), request.headers):
+            return Response(status_code=304, headers=headers)
+        return Response(content=self.body, media_type="application/json", headers=headers)
+
+def cache_key(request: Request) -> str:
+    """Path plus query parameters with empty values dropped and keys sorted."""
+    params = sorted((k, v) for k, v in request.query_params.multi_items() if v != "")
+    return request.url.path + "?" + "&".join(f"{k}={v}" for k, v in params)
+
+def make_entry(
+    body: bytes,
+    headers: Optional[Dict[str, str]] = None,
+    ids: Iterable[int] = (),
+    tail: bool = False,
+    positional: bool = False,
+) -> CachedResponse:
+    return CachedResponse(
+        body=body,
+        etag='"' + hashlib.sha256(body).hexdigest()[:32] + '"',
+        headers=headers or {},
+        ids=frozenset(ids),
+        tail=tail,
+        positional=positional,
+    )
+
+class ResponseCache:
+    """
+    In-process LRU cache of serialized GET responses, bounded by entry count
+    and total body bytes. Entries are dropped precisely by the writes that
+    affect them rather than by flushing everything.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+        max_bytes: int = RESPONSE_CACHE_MAX_BYTES,
+        ttl: float = RESPONSE_CACHE_TTL_SECONDS,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._by_id: Dict[int, Set[str]] = {}
+        self._bytes = 0
+        self._invalidated_at = float("-inf")
+        self._lock = Lock()
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at < time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: str, entry: CachedResponse) -> CachedResponse:
+        if len(entry.body) > self.max_bytes // 8:
+            # Never let one response crowd out most of the cache
+            return entry
+        entry.expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = entry
+            self._bytes += len(entry.body)
+            for row_id in entry.ids:
+                self._by_id.setdefault(row_id, set()).add(key)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+        return entry
+
+    def invalidate_ids(self, ids: Iterable[int]) -> None:
+        """Drop every entry containing one of `ids`, plus offset-addressed pages."""
+        with self._lock:
+            self._invalidated_at = time.monotonic()
+            for row_id in ids:
+                for key in self._by_id.pop(row_id, ()):
+                    self._remove(key)
+            self._remove_where(lambda entry: entry.positional)
+
+    def invalidate_tail(self) -> None:
+        """Drop last pages and offset-addressed pages, where a new row can appear."""
+        with self._lock:
+            self._invalidated_at = time.monotonic()
+            self._remove_where(lambda entry: entry.tail or entry.positional)
+
+    def invalidated_within(self, seconds: float) -> bool:
+        """Whether a write invalidated entries in the last `seconds`."""
+        return time.monotonic() - self._invalidated_at < seconds
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._by_id.clear()
+            self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove_where(self, predicate) -> None:
+        for key in [k for k, entry in self._entries.items() if predicate(entry)]:
+            self._remove(key)
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._bytes -= len(entry.body)
+        for row_id in entry.ids:
+            keys = self._by_id.get(row_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_id[row_id]
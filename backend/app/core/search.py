@@ -0,0 +1,67 @@
+import re
+from typing import Any, List, Optional, Sequence, Tuple
+
+from sqlalchemy import Select, func, literal_column, select, table, column, text, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.base import Service
+from .pagination import decode_cursor
+
+# Queries are reduced to at most this many word terms
+MAX_SEARCH_TERMS = 8
+TERM_RE = re.compile(r"\w+", re.UNICODE)
+
+# Text search configuration used by the services.search_vector column
+TS_CONFIG = literal_column("'english'::regconfig")
+# FTS5 column weights in declaration order: title, description, category
+FTS5_WEIGHTS = (10.0, 1.0, 5.0)
+
+def search_terms(query: str) -> List[str]:
+    return TERM_RE.findall(query.lower())[:MAX_SEARCH_TERMS]
+
+def _postgres_statement(terms: Sequence[str]) -> Tuple[Select, Any]:
+    # Every term must match, each as a prefix ("plumb" finds "plumbing")
+    tsquery = func.to_tsquery(TS_CONFIG, " & ".join(f"{t}:*" for t in terms))
+    vector = literal_column("services.search_vector")
+    rank = func.ts_rank_cd(vector, tsquery)
+    stmt = select(Service, rank.label("rank")).where(vector.op("@@")(tsquery))
+    return stmt, rank
+
+def _sqlite_statement(terms: Sequence[str]) -> Tuple[Select, Any]:
+    fts = table("services_fts", column("rowid"))
+    match = " ".join(f'"{t}"*' for t in terms)
+    # bm25 is lower-is-better; negate it so both dialects rank descending
+    rank = -func.bm25(literal_column("services_fts"), *FTS5_WEIGHTS)
+    stmt = (
+        select(Service, rank.label("rank"))
+        .join(fts, fts.c.rowid == Service.id)
+        .where(text("services_fts MATCH :match").bindparams(match=match))
+    )
+    return stmt, rank
+
+async def search_services(
+    db: AsyncSession, query: str, limit: int, cursor: Optional[str] = None
+) -> List[Tuple[Service, float]]:
+    """
+    Rank active services against `query` over title, category and description
+    using the database's full-text index (Postgres tsvector/GIN or SQLite FTS5).
+    Results are ordered by (rank desc, id desc) and paged by keyset on that
+    pair; one extra row is returned so the caller can tell if a next page exists.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return []
+
+    if db.bind.dialect.name == "postgresql":
+        stmt, rank = _postgres_statement(terms)
+    else:
+        stmt, rank = _sqlite_statement(terms)
+
+    stmt = stmt.where(Service.is_active == True)
+    if cursor:
+        last_rank, last_id = decode_cursor(cursor, types=(float, int))
+        stmt = stmt.where(tuple_(rank, Service.id) < tuple_(last_rank, last_id))
+    stmt = stmt.order_by(rank.desc(), Service.id.desc()).limit(limit + 1)
+
+    result = await db.execute(stmt)
+    return [(row.Service, row.rank) for row in result.all()]
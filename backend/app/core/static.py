@@ -0,0 +1,168 @@
+from email.utils import parsedate
+import os
+import re
+from pathlib import Path
+from typing import Optional, Tuple
+
+import anyio
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse
+from starlette.types import Receive, Scope, Send
+
+# Uploads are never rewritten in place, so content-named files can be cached forever
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+DEFAULT_CACHE_CONTROL = "public, max-age=86400"
+# When set (e.g. "/protected-uploads/"), nginx is asked to send the bytes itself
+ACCEL_REDIRECT_PREFIX = os.getenv("UPLOADS_ACCEL_REDIRECT_PREFIX")
+
+# <sha256>.<ext> originals and <sha256>.w<width>.<fmt> derivatives
+CONTENT_NAME_RE = re.compile(r"^[0-9a-f]{64}(\.w\d+)?\.[a-z0-9]+$")
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+class RangeFileResponse(FileResponse):
+    """
+    206 response carrying the inclusive byte range [start, end] of a file.
+    """
+
+    def __init__(self, path: Path, start: int, end: int, stat_result: os.stat_result, **kwargs):
+        super().__init__(path, status_code=206, stat_result=stat_result, **kwargs)
+        self.start = start
+        self.end = end
+        self.headers["content-length"] = str(end - start + 1)
+        self.headers["content-range"] = f"bytes {start}-{end}/{stat_result.st_size}"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send(
+            {
+                "type": "http.response.start",
+                "status": self.status_code,
+                "headers": self.raw_headers,
+            }
+        )
+        if scope["method"].upper() == "HEAD":
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        remaining = self.end - self.start + 1
+        async with await anyio.open_file(self.path, mode="rb") as file:
+            await file.seek(self.start)
+            while remaining > 0:
+                chunk = await file.read(min(self.chunk_size, remaining))
+                remaining -= len(chunk)
+                more_body = remaining > 0 and len(chunk) > 0
+                await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+                if not chunk:
+                    break
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single-range Range header into an inclusive (start, end) pair.
+    Returns None for ranges that cannot be satisfied; multi-range requests
+    raise ValueError so the caller can fall back to the full file.
+    """
+    match = RANGE_RE.match(header.strip())
+    if match is None:
+        raise ValueError("unsupported range")
+    first, last = match.groups()
+    if not first and not last:
+        raise ValueError("empty range")
+    if not first:
+        # Suffix range: the final `last` bytes
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return None
+    return start, end
+
+def is_not_modified(response_headers: Headers, request_headers: Headers) -> bool:
+    """
+    Evaluate If-None-Match, or If-Modified-Since when no entity tag was sent,
+    against the validators of a response.
+    """
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is not None:
+        etag = response_headers.get("etag", "").replace("W/", "")
+        tags = [tag.strip().replace("W/", "") for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+
+    if_modified_since = parsedate(request_headers.get("if-modified-since", ""))
+    last_modified = parsedate(response_headers.get("last-modified", ""))
+    return (
+        if_modified_since is not None
+        and last_modified is not None
+        and if_modified_since >= last_modified
+    )
+
+def cached_file_response(
+    path: Path,
+    stat_result: os.stat_result,
+    scope: Scope,
+    cache_control: str,
+    etag: Optional[str] = None,
+    extra_headers: Optional[dict] = None,
+    accel_path: Optional[str] = None,
+) -> Response:
+    """
+    Build the response for a static file: validators and caching headers,
+    304 for matching If-None-Match/If-Modified-Since, 206/416 for byte ranges,
+    and an X-Accel-Redirect hand-off when a proxy is configured to send files.
+    Full bodies use the ASGI pathsend extension (zero-copy) if the server offers it.
+    """
+    request_headers = Headers(scope=scope)
+    headers = {"Cache-Control": cache_control, "Accept-Ranges": "bytes", **(extra_headers or {})}
+    if etag:
+        headers["ETag"] = f'"{etag}"'
+    response = FileResponse(path, headers=headers, stat_result=stat_result)
+
+    if ACCEL_REDIRECT_PREFIX and accel_path:
+        # The proxy serves the bytes, ranges and revalidation from disk
+        headers["X-Accel-Redirect"] = ACCEL_REDIRECT_PREFIX.rstrip("/") + "/" + accel_path
+        headers["Content-Type"] = response.media_type
+        return Response(headers={k: v for k, v in headers.items() if k != "Accept-Ranges"})
+
+    if is_not_modified(response.headers, request_headers):
+        return NotModifiedResponse(response.headers)
+
+    range_header = request_headers.get("range")
+    if_range = request_headers.get("if-range")
+    if range_header and (if_range is None or if_range == response.headers["etag"]):
+        try:
+            byte_range = parse_range(range_header, stat_result.st_size)
+        except ValueError:
+            byte_range = (0, stat_result.st_size - 1)
+        if byte_range is None:
+            return Response(
+                status_code=416,
+                headers={"Content-Range": f"bytes */{stat_result.st_size}"},
+            )
+        if byte_range != (0, stat_result.st_size - 1):
+            return RangeFileResponse(path, *byte_range, stat_result=stat_result, headers=headers)
+    return response
+
+class UploadFiles(StaticFiles):
+    """
+    StaticFiles for the uploads directory. Content-addressed files get a strong
+    ETag derived from their name and an immutable far-future Cache-Control, so
+    browsers stop revalidating them; legacy names keep a one-day max-age.
+    """
+
+    def file_response(
+        self,
+        full_path,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        path = Path(full_path)
+        accel_path = os.path.relpath(path, self.directory).replace(os.sep, "/")
+        if status_code == 200 and CONTENT_NAME_RE.match(path.name):
+            return cached_file_response(
+                path, stat_result, scope, IMMUTABLE_CACHE_CONTROL,
+                etag=path.name, accel_path=accel_path,
+            )
+        return cached_file_response(
+            path, stat_result, scope, DEFAULT_CACHE_CONTROL, accel_path=accel_path
+        )
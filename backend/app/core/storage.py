@@ -0,0 +1,204 @@
+import logging
+import os
+import re
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..database import AsyncSessionLocal
+from ..models.base import UploadBlob
+from .tasks import enqueue, task
+
+logger = logging.getLogger(__name__)
+
+# Get the absolute path to the uploads directory
+BASE_DIR = Path(__file__).parent.parent.parent
+UPLOAD_DIR = Path(os.getenv("UPLOAD_DIR", str(BASE_DIR / "uploads"))).resolve()
+
+# Unreferenced blobs are deleted this long after their last reference went
+UPLOAD_GC_DELAY_SECONDS = float(os.getenv("UPLOAD_GC_DELAY_SECONDS", "3600"))
+COLLECT_BLOB_TASK = "uploads.collect"
+# Files no blob row references are left by uploads whose transaction rolled
+# back after the file was placed; they are swept once this old
+UPLOAD_ORPHAN_GRACE_SECONDS = float(os.getenv("UPLOAD_ORPHAN_GRACE_SECONDS", "3600"))
+UPLOAD_ORPHAN_SWEEP_SECONDS = float(os.getenv("UPLOAD_ORPHAN_SWEEP_SECONDS", "3600"))
+SWEEP_ORPHANS_TASK = "uploads.sweep_orphans"
+ORPHAN_LOOKUP_BATCH = 500
+
+def ensure_upload_dir() -> None:
+    """Create the upload directory; called once at application startup."""
+    UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+
+# /uploads/ab/cd/<sha256><ext>: two levels of fan-out keep every directory small
+BLOB_URL_RE = re.compile(r"^/uploads/([0-9a-f]{2})/([0-9a-f]{2})/([0-9a-f]{64})(\.[a-z0-9]+)$")
+
+def blob_relpath(digest: str, extension: str) -> str:
+    return f"{digest[:2]}/{digest[2:4]}/{digest}{extension}"
+
+def blob_url(digest: str, extension: str) -> str:
+    return f"/uploads/{blob_relpath(digest, extension)}"
+
+def parse_blob_url(url: Optional[str]) -> Optional[str]:
+    """
+    Return the digest of a content-addressed upload URL, or None for legacy
+    flat /uploads/<uuid>.ext URLs and anything else.
+    """
+    match = BLOB_URL_RE.match(url or "")
+    return match.group(3) if match else None
+
+def _place_file(source: str, target: Path) -> None:
+    target.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(source, target)
+
+def _discard(path: str) -> None:
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+async def _add_reference(db: AsyncSession, digest: str) -> bool:
+    result = await db.execute(
+        update(UploadBlob)
+        .where(UploadBlob.digest == digest)
+        .values(ref_count=UploadBlob.ref_count + 1)
+    )
+    return result.rowcount > 0
+
+async def store_blob(
+    db: AsyncSession, tmp_path: str, digest: str, extension: str, size: int
+) -> str:
+    """
+    Move a fully written temporary file into the content-addressed store and
+    return its URL. If identical content is already stored, its reference count
+    is bumped and the temporary file is dropped instead of being written again.
+    The reference count changes in the caller's transaction; if that rolls
+    back, a newly placed file is left without a row until sweep_orphans.
+    """
+    relpath = blob_relpath(digest, extension)
+    target = UPLOAD_DIR / relpath
+
+    if await _add_reference(db, digest):
+        if await run_in_threadpool(target.exists):
+            await run_in_threadpool(_discard, tmp_path)
+        else:
+            # Row survived but the file went missing; restore it from this upload
+            await run_in_threadpool(_place_file, tmp_path, target)
+        logger.info(f"Deduplicated upload {digest}")
+        return blob_url(digest, extension)
+
+    await run_in_threadpool(_place_file, tmp_path, target)
+    try:
+        async with db.begin_nested():
+            db.add(UploadBlob(digest=digest, path=relpath, size=size, ref_count=1))
+    except IntegrityError:
+        # A concurrent upload of the same content registered it first
+        await _add_reference(db, digest)
+    return blob_url(digest, extension)
+
+async def release_blob(db: AsyncSession, url: Optional[str]) -> None:
+    """
+    Drop one reference to a stored upload. Blobs that reach zero references
+    stay on disk until collected UPLOAD_GC_DELAY_SECONDS later, so a rolled
+    back transaction never loses a file another row still points at.
+    """
+    digest = parse_blob_url(url)
+    if digest is None:
+        return
+    result = await db.execute(
+        update(UploadBlob)
+        .where(UploadBlob.digest == digest, UploadBlob.ref_count > 0)
+        .values(ref_count=UploadBlob.ref_count - 1)
+        .returning(UploadBlob.ref_count)
+    )
+    if result.scalar_one_or_none() == 0:
+        enqueue(db, COLLECT_BLOB_TASK, {"digest": digest}, delay=UPLOAD_GC_DELAY_SECONDS)
+
+def _remove_blob_files(path: Path) -> None:
+    # The blob and its resized variants, named <digest>.w<width>.<format>
+    for file in [path, *path.parent.glob(f"{path.stem}.w*")]:
+        file.unlink(missing_ok=True)
+
+@task(COLLECT_BLOB_TASK, concurrency=1)
+async def collect_blob(payload: Dict[str, Any]) -> None:
+    """
+    Delete a blob that is still unreferenced. The row stays locked while the
+    files go, so a concurrent upload of the same content waits and then
+    stores it afresh.
+    """
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(UploadBlob)
+            .where(UploadBlob.digest == payload["digest"], UploadBlob.ref_count == 0)
+            .with_for_update()
+        )
+        blob = result.scalar_one_or_none()
+        if blob is None:
+            # Referenced again, or already collected
+            return
+        await run_in_threadpool(_remove_blob_files, UPLOAD_DIR / blob.path)
+        await db.execute(delete(UploadBlob).where(UploadBlob.digest == blob.digest))
+        await db.commit()
+    logger.info(f"Collected unreferenced upload {payload['digest']}")
+
+HEX_RE = re.compile(r"^[0-9a-f]{2}$")
+DIGEST_RE = re.compile(r"^([0-9a-f]{64})\.")
+
+def _stale_files(cutoff: float) -> Dict[str, List[Path]]:
+    """
+    Files in the content-addressed store not modified since `cutoff`, grouped
+    by digest (a blob with its resized variants), plus abandoned temporary
+    upload files under the "" key. Legacy flat uploads are never included.
+    """
+    stale: Dict[str, List[Path]] = {}
+    for tmp in UPLOAD_DIR.glob(".upload-*"):
+        if tmp.stat().st_mtime < cutoff:
+            stale.setdefault("", []).append(tmp)
+    for first in UPLOAD_DIR.iterdir():
+        if not (first.is_dir() and HEX_RE.match(first.name)):
+            continue
+        for second in first.iterdir():
+            if not (second.is_dir() and HEX_RE.match(second.name)):
+                continue
+            for file in second.iterdir():
+                match = DIGEST_RE.match(file.name)
+                if match and file.stat().st_mtime < cutoff:
+                    stale.setdefault(match.group(1), []).append(file)
+    return stale
+
+def _remove_stale(files: List[Path], cutoff: float) -> int:
+    removed = 0
+    for file in files:
+        try:
+            # A concurrent upload of the same content may have just put it back
+            if file.stat().st_mtime < cutoff:
+                file.unlink()
+                removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+@task(SWEEP_ORPHANS_TASK, concurrency=1, every=UPLOAD_ORPHAN_SWEEP_SECONDS)
+async def sweep_orphans(payload: Dict[str, Any]) -> None:
+    """
+    Delete stored files that no blob row references and that have not been
+    touched for UPLOAD_ORPHAN_GRACE_SECONDS, far longer than any upload's
+    transaction stays open. collect_blob only sees files that have rows.
+    """
+    cutoff = time.time() - UPLOAD_ORPHAN_GRACE_SECONDS
+    stale = await run_in_threadpool(_stale_files, cutoff)
+    orphans = stale.pop("", [])
+    digests = list(stale)
+    async with AsyncSessionLocal() as db:
+        for start in range(0, len(digests), ORPHAN_LOOKUP_BATCH):
+            batch = digests[start:start + ORPHAN_LOOKUP_BATCH]
+            result = await db.execute(select(UploadBlob.digest).where(UploadBlob.digest.in_(batch)))
+            referenced = set(result.scalars().all())
+            orphans += [file for digest in batch if digest not in referenced for file in stale[digest]]
+    removed = await run_in_threadpool(_remove_stale, orphans, cutoff)
+    if removed:
+        logger.info(f"Swept {removed} orphaned upload files")
@@ -0,0 +1,273 @@
+import asyncio
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+import logging
+import os
+import random
+import socket
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Set
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from ..database import AsyncSessionLocal
+from ..models.base import QueuedTask
+
+logger = logging.getLogger(__name__)
+
+# How often an idle worker looks for due tasks
+TASK_POLL_SECONDS = float(os.getenv("TASK_POLL_SECONDS", "1"))
+# Retry delays double from TASK_BACKOFF_SECONDS up to TASK_BACKOFF_MAX_SECONDS
+TASK_BACKOFF_SECONDS = float(os.getenv("TASK_BACKOFF_SECONDS", "5"))
+TASK_BACKOFF_MAX_SECONDS = float(os.getenv("TASK_BACKOFF_MAX_SECONDS", "3600"))
+# How often a worker marks tasks that timed out on their last attempt as failed
+TASK_SWEEP_SECONDS = float(os.getenv("TASK_SWEEP_SECONDS", "60"))
+MAX_ERROR_LENGTH = 2000
+
+QUEUED = "queued"
+RUNNING = "running"
+FAILED = "failed"
+
+Handler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+@dataclass
+class TaskType:
+    """
+    A kind of background work. `concurrency` caps how many run at once in
+    each worker process; `timeout` bounds one attempt and is also how long a
+    claim hides the task from other workers. A task type with `every` is
+    periodic: workers keep one run of it queued, `every` seconds ahead.
+    """
+    name: str
+    handler: Handler
+    concurrency: int = 1
+    max_attempts: int = 5
+    timeout: float = 300
+    every: Optional[float] = None
+
+registry: Dict[str, TaskType] = {}
+
+def task(
+    name: str, concurrency: int = 1, max_attempts: int = 5, timeout: float = 300, every: Optional[float] = None
+):
+    """Register an async handler taking the task payload as the task type `name`."""
+    def register(handler: Handler) -> Handler:
+        registry[name] = TaskType(name, handler, concurrency, max_attempts, timeout, every)
+        return handler
+    return register
+
+def enqueue(
+    db: AsyncSession, kind: str, payload: Optional[Dict[str, Any]] = None, delay: float = 0
+) -> QueuedTask:
+    """
+    Add a task to the caller's transaction: workers only see it once the
+    business write it belongs to commits, and never if it rolls back.
+    """
+    queued = QueuedTask(
+        kind=kind,
+        payload=payload or {},
+        status=QUEUED,
+        run_at=datetime.utcnow() + timedelta(seconds=delay),
+    )
+    db.add(queued)
+    return queued
+
+def backoff(attempts: int) -> float:
+    """Seconds before retrying after `attempts` failures, with jitter."""
+    delay = min(TASK_BACKOFF_MAX_SECONDS, TASK_BACKOFF_SECONDS * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+async def claim(db: AsyncSession, task_type: TaskType, limit: int, worker: str) -> List[QueuedTask]:
+    """
+    Atomically take up to `limit` due tasks of one type: queued ones whose
+    run_at has passed, and running ones whose claim expired. On Postgres the
+    candidates are locked with FOR UPDATE SKIP LOCKED, so concurrent workers
+    take different rows without waiting on each other; SQLite serializes
+    writers, which gives the same result.
+    """
+    now = datetime.utcnow()
+    due = (
+        select(QueuedTask.id)
+        .where(
+            QueuedTask.kind == task_type.name,
+            QueuedTask.status.in_((QUEUED, RUNNING)),
+            QueuedTask.run_at <= now,
+            QueuedTask.attempts < task_type.max_attempts,
+        )
+        .order_by(QueuedTask.run_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    result = await db.execute(
+        update(QueuedTask)
+        .where(QueuedTask.id.in_(due))
+        .values(
+            status=RUNNING,
+            attempts=QueuedTask.attempts + 1,
+            run_at=now + timedelta(seconds=task_type.timeout),
+            locked_by=worker,
+        )
+        .returning(QueuedTask)
+        .execution_options(synchronize_session=False)
+    )
+    claimed = list(result.scalars().all())
+    await db.commit()
+    return claimed
+
+def _current_claim(claimed: QueuedTask):
+    # A claim that expired may have been taken over by another worker, which
+    # bumped attempts; only the current holder may settle the task
+    return (
+        (QueuedTask.id == claimed.id)
+        & (QueuedTask.status == RUNNING)
+        & (QueuedTask.attempts == claimed.attempts)
+    )
+
+async def complete(db: AsyncSession, claimed: QueuedTask) -> None:
+    await db.execute(delete(QueuedTask).where(_current_claim(claimed)))
+    await db.commit()
+
+async def retry_or_fail(db: AsyncSession, task_type: TaskType, claimed: QueuedTask, error: str) -> None:
+    """Requeue a failed attempt after backoff, or give up after max_attempts."""
+    exhausted = claimed.attempts >= task_type.max_attempts
+    await db.execute(
+        update(QueuedTask)
+        .where(_current_claim(claimed))
+        .values(
+            status=FAILED if exhausted else QUEUED,
+            run_at=datetime.utcnow() + timedelta(seconds=0 if exhausted else backoff(claimed.attempts)),
+            locked_by=None,
+            last_error=error[:MAX_ERROR_LENGTH],
+        )
+    )
+    await db.commit()
+
+async def fail_expired(db: AsyncSession, task_type: TaskType) -> int:
+    """Mark tasks whose last allowed attempt never reported back as failed."""
+    result = await db.execute(
+        update(QueuedTask)
+        .where(
+            QueuedTask.kind == task_type.name,
+            QueuedTask.status == RUNNING,
+            QueuedTask.run_at <= datetime.utcnow(),
+            QueuedTask.attempts >= task_type.max_attempts,
+        )
+        .values(status=FAILED, locked_by=None, last_error="Timed out on the last attempt")
+    )
+    await db.commit()
+    return result.rowcount
+
+async def schedule_periodic(db: AsyncSession, task_type: TaskType) -> bool:
+    """
+    Queue the next run of a periodic task type unless one is already queued
+    or running. Workers racing here may both queue a run; periodic handlers
+    are idempotent like all others, so the duplicate is harmless.
+    """
+    pending = await db.scalar(
+        select(QueuedTask.id)
+        .where(QueuedTask.kind == task_type.name, QueuedTask.status.in_((QUEUED, RUNNING)))
+        .limit(1)
+    )
+    if pending is not None:
+        return False
+    enqueue(db, task_type.name, delay=task_type.every)
+    await db.commit()
+    return True
+
+class Worker:
+    """
+    Runs registered task types from the queue table, each with at most its
+    `concurrency` tasks in flight in this process. Delivery is at least once:
+    a task whose worker dies is retried when its claim expires, so handlers
+    must be idempotent.
+    """
+
+    def __init__(
+        self,
+        kinds: Optional[Sequence[str]] = None,
+        name: Optional[str] = None,
+        session_factory: async_sessionmaker = AsyncSessionLocal,
+        poll_interval: float = TASK_POLL_SECONDS,
+    ):
+        unknown = [kind for kind in kinds or () if kind not in registry]
+        if unknown:
+            raise ValueError(f"Unknown task types: {', '.join(unknown)}")
+        self.types = [registry[kind] for kind in kinds or registry]
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        self.session_factory = session_factory
+        self.poll_interval = poll_interval
+        self._in_flight: Dict[str, Set[asyncio.Task]] = {t.name: set() for t in self.types}
+
+    async def run(self, stop: asyncio.Event) -> None:
+        """Claim and run tasks until `stop` is set, then let in-flight ones finish."""
+        logger.info(f"Worker {self.name} running {', '.join(t.name for t in self.types)}")
+        next_sweep = 0.0
+        while not stop.is_set():
+            try:
+                if time.monotonic() >= next_sweep:
+                    await self.sweep()
+                    next_sweep = time.monotonic() + TASK_SWEEP_SECONDS
+                claimed = await self.poll()
+            except Exception as e:
+                logger.error(f"Worker {self.name} could not poll the task queue: {str(e)}")
+                claimed = 0
+            if not claimed:
+                try:
+                    await asyncio.wait_for(stop.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+        in_flight = [t for running in self._in_flight.values() for t in running]
+        if in_flight:
+            logger.info(f"Worker {self.name} waiting for {len(in_flight)} running tasks")
+            await asyncio.gather(*in_flight, return_exceptions=True)
+
+    async def poll(self) -> int:
+        """Claim as many due tasks as there are free slots; returns how many."""
+        claimed = 0
+        for task_type in self.types:
+            running = self._in_flight[task_type.name]
+            free = task_type.concurrency - len(running)
+            if free <= 0:
+                continue
+            async with self.session_factory() as db:
+                batch = await claim(db, task_type, free, self.name)
+            for queued in batch:
+                runner = asyncio.create_task(self._execute(task_type, queued))
+                running.add(runner)
+                runner.add_done_callback(running.discard)
+            claimed += len(batch)
+        return claimed
+
+    async def sweep(self) -> None:
+        for task_type in self.types:
+            async with self.session_factory() as db:
+                failed = await fail_expired(db, task_type)
+                if task_type.every is not None:
+                    await schedule_periodic(db, task_type)
+            if failed:
+                logger.warning(f"{failed} {task_type.name} tasks timed out on their last attempt")
+
+    async def _execute(self, task_type: TaskType, queued: QueuedTask) -> None:
+        started = time.perf_counter()
+        error = None
+        try:
+            await asyncio.wait_for(task_type.handler(dict(queued.payload)), task_type.timeout)
+        except Exception as e:
+            error = f"{type(e).__name__}: {str(e)}"
+            logger.warning(
+                f"Task {queued.id} ({task_type.name}) failed on attempt "
+                f"{queued.attempts}/{task_type.max_attempts}: {error}"
+            )
+        else:
+            logger.info(f"Task {queued.id} ({task_type.name}) done in {time.perf_counter() - started:.2f}s")
+        try:
+            async with self.session_factory() as db:
+                if error is None:
+                    await complete(db, queued)
+                else:
+                    await retry_or_fail(db, task_type, queued, error)
+        except Exception as e:
+            # The claim expires and the task is retried
+            logger.error(f"Could not record the outcome of task {queued.id}: {str(e)}")
@@ -0,0 +1,65 @@
+import asyncio
+import logging
+import os
+from typing import List
+
+from sqlalchemy import Executable, select
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import QueuePool
+
+from ..models.base import Job, Message, Service, User
+from .. import schemas
+from .pagination import paginate
+from .projection import Projection
+
+logger = logging.getLogger(__name__)
+
+# Connections opened at startup; defaults to the pool's steady-state size
+DB_POOL_WARMUP = os.getenv("DB_POOL_WARMUP")
+
+def hot_statements() -> List[Executable]:
+    """
+    The statements behind the busiest endpoints, in the exact shape the
+    routers build them. Running them once fills SQLAlchemy's compiled cache
+    and, on asyncpg, each connection's prepared statement cache. The filter
+    values match nothing, so warming reads no rows.
+    """
+    return [
+        select(User).where(User.email == ""),
+        select(User).where(User.id == -1),
+        select(Service).where(Service.id == -1),
+        paginate(Projection(Service, schemas.Service).select().where(Service.is_active == True), Service, 0),
+        paginate(Projection(Job, schemas.Job).select().where(Job.client_id == -1), Job, 0),
+        paginate(Projection(Message, schemas.Message).select().where(Message.job_id == -1), Message, 0),
+    ]
+
+async def _warm_connection(engine: AsyncEngine, statements: List[Executable]) -> None:
+    async with engine.connect() as conn:
+        for statement in statements:
+            await conn.execute(statement)
+
+async def warm_up(engine: AsyncEngine) -> None:
+    """
+    Open the pool's connections concurrently and run the hot statements on
+    each, so the first requests after a (re)start skip connection setup and
+    statement compilation. Failures are logged, not raised: the readiness
+    probe reports an unreachable database.
+    """
+    pool = engine.sync_engine.pool
+    if DB_POOL_WARMUP is not None:
+        count = int(DB_POOL_WARMUP)
+    else:
+        count = pool.size() if isinstance(pool, QueuePool) else 1
+    if count <= 0:
+        return
+
+    statements = hot_statements()
+    results = await asyncio.gather(
+        *(_warm_connection(engine, statements) for _ in range(count)),
+        return_exceptions=True,
+    )
+    failures = [r for r in results if isinstance(r, BaseException)]
+    if failures:
+        logger.warning(f"Pool warm-up: {len(failures)} of {count} connections failed: {failures[0]}")
+    else:
+        logger.info(f"Warmed {count} database connections with {len(statements)} statements")
@@ -1,64 +1,146 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import JSONResponse, ORJSONResponse
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from dotenv import load_dotenv
-import os
-from pathlib import Path
 import logging
+import os
 
-from .routers import auth, services, jobs, messages
-from .database import engine
-from .models.base import Base
-
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
-logger = logging.getLogger(__name__)
+from .routers import auth, services, jobs, messages, images, monitoring
+from .database import async_engine, engine, init_db, replica_async_engine
+from .core.static import UploadFiles
+from .core.admission import ADMISSION_CONTROL, AdmissionMiddleware
+from .core.metrics import MetricsMiddleware
+from .core.profiling import DEBUG, QueryHeadersMiddleware
+from .core.replica import ReplicaStickinessMiddleware
+from .core.storage import UPLOAD_DIR, ensure_upload_dir
+from .core.auth import configure_password_hashing
+from .core.tasks import Worker
+from .core.warmup import warm_up
 
 # Load environment variables
 load_dotenv()
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
-
-# Get the absolute path to the uploads directory
-BASE_DIR = Path(__file__).parent.parent
-UPLOAD_DIR = BASE_DIR / "uploads"
-UPLOAD_DIR.mkdir(exist_ok=True)
-
-logger.debug(f"Base directory: {BASE_DIR}")
-logger.debug(f"Upload directory: {UPLOAD_DIR}")
-logger.debug(f"Upload directory exists: {UPLOAD_DIR.exists()}")
-logger.debug(f"Upload directory permissions: {os.access(UPLOAD_DIR, os.W_OK)}")
-
-# Create FastAPI app
-app = FastAPI(
-    title="TaskConnect API",
-    description="Backend API for TaskConnect platform",
-    version="1.0.0"
-)
-
-# Configure CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["http://localhost:3000", "http://127.0.0.1:3000", "http://localhost:8080", "http://127.0.0.1:8080"],  # Frontend URLs
-    allow_credentials=True,
-    allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-    allow_headers=["Content-Type", "Authorization", "Accept"],
-    expose_headers=["*"],
-    max_age=3600,  # Cache preflight requests for 1 hour
-)
-
-# Mount static files directory
-logger.debug("Mounting static files directory...")
-app.mount("/uploads", StaticFiles(directory=str(UPLOAD_DIR)), name="uploads")
-logger.debug("Static files directory mounted successfully")
-
-# Include routers
-app.include_router(auth.router, prefix="/auth", tags=["auth"])
-app.include_router(services.router, prefix="/services", tags=["services"])
-app.include_router(jobs.router, prefix="/jobs", tags=["jobs"])
-app.include_router(messages.router, prefix="/messages", tags=["messages"])
-
-@app.get("/")
-async def root():
-    return {"message": "Welcome to TaskConnect API"} 
\ No newline at end of file
+logger = logging.getLogger(__name__)
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# Opt-in create_all for local development; deployed schemas come from
+# `alembic upgrade head`, which builds an empty database from scratch
+DB_CREATE_ALL = os.getenv("DB_CREATE_ALL", "").lower() in ("1", "true", "yes")
+# Run a task worker inside each API process, for local development; deployments
+# run scripts/run_worker.py instead
+RUN_TASK_WORKER = os.getenv("RUN_TASK_WORKER", "").lower() in ("1", "true", "yes")
+
+# Frontend dev and preview servers; CORS_ORIGINS (comma separated) replaces the list
+DEFAULT_CORS_ORIGINS = [
+    "http://localhost:3000",
+    "http://127.0.0.1:3000",
+    "http://localhost:8080",
+    "http://127.0.0.1:8080",
+    "http://localhost:5173",  # Vite default port
+    "http://127.0.0.1:5173",
+    "http://localhost:4173",  # Vite preview port
+    "http://127.0.0.1:4173",
+    "http://localhost:5000",
+    "http://127.0.0.1:5000",
+]
+
+def cors_origins() -> list:
+    configured = os.getenv("CORS_ORIGINS")
+    if not configured:
+        return DEFAULT_CORS_ORIGINS
+    return [origin.strip() for origin in configured.split(",") if origin.strip()]
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    logging.basicConfig(level=LOG_LEVEL)
+    ensure_upload_dir()
+    if DB_CREATE_ALL:
+        await init_db()
+    await configure_password_hashing()
+    await warm_up(async_engine)
+    if replica_async_engine is not None:
+        await warm_up(replica_async_engine)
+    stop_worker = asyncio.Event()
+    worker = asyncio.create_task(Worker().run(stop_worker)) if RUN_TASK_WORKER else None
+    logger.info("Startup complete")
+    yield
+    if worker is not None:
+        stop_worker.set()
+        await worker
+    await async_engine.dispose()
+    if replica_async_engine is not None:
+        await replica_async_engine.dispose()
+    engine.dispose()
+
+async def pool_timeout_handler(request: Request, exc: PoolTimeoutError) -> JSONResponse:
+    """
+    No pooled connection became free within DB_POOL_TIMEOUT: the worker is
+    saturated, so shed the request with a retryable 503 instead of a 500.
+    """
+    logger.warning(f"Database pool exhausted on {request.method} {request.url.path}: {str(exc)}")
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Database is busy, please retry"},
+        headers={"Retry-After": "1"},
+    )
+
+def create_app() -> FastAPI:
+    """
+    Build the API application. Construction has no I/O: directories, schema
+    (when DB_CREATE_ALL is set), bcrypt calibration and the connection pool
+    are all set up in the lifespan, once per worker.
+    """
+    app = FastAPI(
+        title="TaskConnect API",
+        description="Backend API for TaskConnect platform",
+        version="1.0.0",
+        lifespan=lifespan,
+        # Encodes the validated response_model output with orjson instead of json
+        default_response_class=ORJSONResponse,
+    )
+
+    # Inside CORS, so shed requests still carry CORS headers and preflights
+    # are answered without queueing
+    if ADMISSION_CONTROL:
+        app.add_middleware(AdmissionMiddleware)
+
+    # Configure CORS
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=cors_origins(),
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["*"],
+        max_age=3600,  # Cache preflight requests for 1 hour
+    )
+
+    app.add_exception_handler(PoolTimeoutError, pool_timeout_handler)
+
+    app.add_middleware(ReplicaStickinessMiddleware)
+    if DEBUG:
+        app.add_middleware(QueryHeadersMiddleware)
+    # Outermost, so latency covers every other middleware
+    app.add_middleware(MetricsMiddleware)
+
+    # The directory is created in the lifespan, after this runs
+    app.mount("/uploads", UploadFiles(directory=str(UPLOAD_DIR), check_dir=False), name="uploads")
+
+    # Include routers
+    app.include_router(auth.router, prefix="/auth", tags=["auth"])
+    app.include_router(services.router, prefix="/services", tags=["services"])
+    app.include_router(jobs.router, prefix="/jobs", tags=["jobs"])
+    app.include_router(messages.router, prefix="/messages", tags=["messages"])
+    app.include_router(images.router, prefix="/images", tags=["images"])
+    app.include_router(monitoring.router, tags=["monitoring"])
+
+    @app.get("/")
+    async def root():
+        return {"message": "Welcome to TaskConnect API"}
+
+    return app
+
+app = create_app()
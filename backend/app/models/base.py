@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Text, Enum
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Text, Enum, DDL, Index, JSON, event, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -48,6 +48,67 @@ class Service(Base):
     owner = relationship("User", back_populates="services")
     jobs = relationship("Job", back_populates="service")
 
+    __table_args__ = (
+        # The public listing only ever reads active services in (created_at, id) order
+        Index(
+            "ix_services_active_created_at_id", "created_at", "id",
+            postgresql_where=text("is_active"),
+            sqlite_where=text("is_active = 1"),
+        ),
+    )
+
+# Full-text search index for the catalog, maintained by the database itself.
+# Postgres gets a stored tsvector column with a GIN index, SQLite an external
+# content FTS5 table kept in sync by triggers. Mirrors the add_service_search
+# revision so create_all builds the same thing for local runs.
+SERVICE_SEARCH_DDL = {
+    "postgresql": [
+        """
+        ALTER TABLE services ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(category, '')), 'B') ||
+            setweight(to_tsvector('english', coalesce(description, '')), 'C')
+        ) STORED
+        """,
+        "CREATE INDEX IF NOT EXISTS ix_services_search_vector ON services USING gin (search_vector)",
+    ],
+    "sqlite": [
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS services_fts USING fts5(
+            title, description, category, content='services', content_rowid='id'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS services_fts_ai AFTER INSERT ON services BEGIN
+            INSERT INTO services_fts(rowid, title, description, category)
+            VALUES (new.id, new.title, new.description, new.category);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS services_fts_ad AFTER DELETE ON services BEGIN
+            INSERT INTO services_fts(services_fts, rowid, title, description, category)
+            VALUES ('delete', old.id, old.title, old.description, old.category);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS services_fts_au AFTER UPDATE ON services BEGIN
+            INSERT INTO services_fts(services_fts, rowid, title, description, category)
+            VALUES ('delete', old.id, old.title, old.description, old.category);
+            INSERT INTO services_fts(rowid, title, description, category)
+            VALUES (new.id, new.title, new.description, new.category);
+        END
+        """,
+        "INSERT INTO services_fts(services_fts) VALUES ('rebuild')",
+    ],
+}
+
+for _dialect, _statements in SERVICE_SEARCH_DDL.items():
+    for _statement in _statements:
+        event.listen(
+            Service.__table__, "after_create", DDL(_statement).execute_if(dialect=_dialect)
+        )
+
 class Job(Base):
     __tablename__ = "jobs"
 
@@ -65,6 +126,10 @@ class Job(Base):
     service = relationship("Service", back_populates="jobs")
     messages = relationship("Message", back_populates="job")
 
+    __table_args__ = (
+        Index("ix_jobs_client_id_created_at_id", "client_id", "created_at", "id"),
+    )
+
 class Message(Base):
     __tablename__ = "messages"
 
@@ -76,4 +141,39 @@ class Message(Base):
 
     # Relationships
     sender = relationship("User", back_populates="messages")
-    job = relationship("Job", back_populates="messages") 
\ No newline at end of file
+    job = relationship("Job", back_populates="messages")
+
+    __table_args__ = (
+        Index("ix_messages_job_id_created_at_id", "job_id", "created_at", "id"),
+    )
+
+class UploadBlob(Base):
+    __tablename__ = "upload_blobs"
+
+    # SHA-256 of the file content, which also determines its path under /uploads
+    digest = Column(String(64), primary_key=True)
+    path = Column(String, unique=True, nullable=False)
+    size = Column(Integer, nullable=False)
+    ref_count = Column(Integer, default=1, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class QueuedTask(Base):
+    __tablename__ = "task_queue"
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(64), nullable=False)
+    payload = Column(JSON, nullable=False, default=dict)
+    status = Column(String(16), nullable=False, default="queued")  # queued, running, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    # Queued: earliest time to run. Running: when the claim expires and the
+    # task becomes claimable again (the worker is presumed dead)
+    run_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    locked_by = Column(String, nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        # Workers claim the oldest due tasks of one kind
+        Index("ix_task_queue_kind_status_run_at", "kind", "status", "run_at"),
+    )
@@ -1,21 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Form
+from fastapi import APIRouter, Depends, HTTPException, Request, status, Form
 from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
 from typing import Any
 from fastapi.responses import JSONResponse
 import logging
 
-from ..database import get_db
+from ..database import get_async_db
 from ..models.base import User
 from ..schemas import UserCreate, User as UserSchema, Token
 from ..core.auth import (
-    verify_password,
-    get_password_hash,
+    hash_password,
+    verify_and_update_password,
     create_access_token,
     ACCESS_TOKEN_EXPIRE_MINUTES,
-    get_current_user
+    get_current_user,
+    token_claims
 )
+from ..core.ratelimit import check_rate_limit, record_attempt
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -24,28 +28,38 @@ logger = logging.getLogger(__name__)
 async def options_handler():
     return {}
 
+async def _duplicate_user_error(db: AsyncSession, user: UserCreate) -> Exception:
+    result = await db.execute(
+        select(User.email, User.username)
+        .where(or_(User.email == user.email, User.username == user.username))
+    )
+    taken = result.all()
+    if any(row.email == user.email for row in taken):
+        logger.warning(f"Email {user.email} already registered")
+        return HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email already registered"
+        )
+    if taken:
+        logger.warning(f"Username {user.username} already taken")
+        return HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Username already taken"
+        )
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Registration conflicts with an existing user"
+    )
+
 @router.post("/register", response_model=UserSchema)
-async def register(user: UserCreate, db: Session = Depends(get_db)) -> Any:
+async def register(
+    user: UserCreate, request: Request, db: AsyncSession = Depends(get_async_db)
+) -> Any:
+    await check_rate_limit(request, "register")
     try:
         logger.info(f"Received registration request with data: {user.dict()}")
         
-        db_user = db.query(User).filter(User.email == user.email).first()
-        if db_user:
-            logger.warning(f"Email {user.email} already registered")
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Email already registered"
-            )
-        
-        db_user = db.query(User).filter(User.username == user.username).first()
-        if db_user:
-            logger.warning(f"Username {user.username} already taken")
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Username already taken"
-            )
-        
-        hashed_password = get_password_hash(user.password)
+        hashed_password = await hash_password(user.password)
         db_user = User(
             email=user.email,
             username=user.username,
@@ -54,13 +68,21 @@ async def register(user: UserCreate, db: Session = Depends(get_db)) -> Any:
             hashed_password=hashed_password
         )
         db.add(db_user)
-        db.commit()
-        db.refresh(db_user)
+        try:
+            await db.commit()
+        except IntegrityError:
+            # The unique indexes on email and username decide; only a rejected
+            # insert pays for finding out which one it hit
+            await db.rollback()
+            raise await _duplicate_user_error(db, user)
         logger.info(f"Successfully registered user with email: {user.email}")
         return db_user
+    except HTTPException:
+        await db.rollback()
+        raise
     except Exception as e:
         logger.error(f"Registration failed with error: {str(e)}")
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
@@ -68,21 +90,37 @@ async def register(user: UserCreate, db: Session = Depends(get_db)) -> Any:
 
 @router.post("/token")
 async def login(
+    request: Request,
     email: str = Form(...),
     password: str = Form(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> Any:
-    user = db.query(User).filter(User.email == email).first()
-    if not user or not verify_password(password, str(user.hashed_password)):
+    account = email.strip().lower()
+    # Only checked here, so it is the one to refuse first without spending
+    await check_rate_limit(request, "login_failure", account=account, spend=False)
+    await check_rate_limit(request, "login")
+    result = await db.execute(select(User).where(User.email == email))
+    user = result.scalars().first()
+    verified, new_hash = (False, None)
+    if user:
+        verified, new_hash = await verify_and_update_password(password, str(user.hashed_password))
+    if not verified:
+        await record_attempt(request, "login_failure", account=account)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+
+    if new_hash:
+        # Stored hash used an outdated scheme or cost; upgrade it transparently
+        user.hashed_password = new_hash
+        await db.commit()
+        logger.info(f"Rehashed password for user id {user.id}")
     
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
+        data=token_claims(user), expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
@@ -0,0 +1,43 @@
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from starlette.responses import Response
+from typing import Optional
+import os
+
+from ..core.images import select_variant, upload_path
+from ..core.static import CONTENT_NAME_RE, cached_file_response
+from ..core.storage import UPLOAD_DIR
+
+router = APIRouter()
+
+@router.get("/{path:path}")
+async def read_image(
+    path: str,
+    request: Request,
+    w: Optional[int] = None
+) -> Response:
+    """
+    Serve an uploaded image resized to at least `w` pixels wide, in the best
+    format the client accepts (AVIF/WebP), or the original when no variant exists.
+    """
+    original = upload_path(f"/uploads/{path}")
+    if original is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    variant = select_variant(original, w, request.headers.get("accept", ""))
+    try:
+        stat_result = await run_in_threadpool(os.stat, variant)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    # Variants appear asynchronously after upload, so only cache the fallback briefly
+    max_age = 86400 if variant != original or w is None else 60
+    return cached_file_response(
+        variant,
+        stat_result,
+        request.scope,
+        f"public, max-age={max_age}",
+        etag=variant.name if CONTENT_NAME_RE.match(variant.name) else None,
+        extra_headers={"Vary": "Accept"},
+        accel_path=os.path.relpath(variant, UPLOAD_DIR).replace(os.sep, "/"),
+    )
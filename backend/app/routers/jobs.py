@@ -1,86 +1,127 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List, Any
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import delete, exists, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Any, Literal, Optional
 
-from ..database import get_db
-from ..models.base import Job, User
-from ..schemas import JobCreate, Job as JobSchema
-from ..core.auth import get_current_user
+from ..database import get_async_db
+from ..models.base import Job, Message
+from ..schemas import JobCreate, Job as JobSchema, JobExpanded, ServiceSummary, UserSummary
+from ..core.auth import Principal, get_current_principal
+from ..core.expand import parse_expand
+from ..core.ownership import raise_for_miss
+from ..core.ratelimit import check_rate_limit
+from ..core.export import export_response
+from ..core.pagination import MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, paginate, page_rows
+from ..core.projection import Projection, json_response
+from ..core.replica import get_read_db, read_session_factory
 
 router = APIRouter()
 
+# Relations that can be embedded in job listings with ?expand=
+JOB_RELATIONS = {"service": ServiceSummary, "client": UserSummary}
+
 @router.post("/", response_model=JobSchema)
-def create_job(
+async def create_job(
     job: JobCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal)
 ) -> Any:
+    await check_rate_limit(request, "create_job", account=current_user.id)
     db_job = Job(**job.dict(), client_id=current_user.id, status="pending")
     db.add(db_job)
-    db.commit()
-    db.refresh(db_job)
+    await db.commit()
     return db_job
 
-@router.get("/", response_model=List[JobSchema])
-def read_jobs(
-    skip: int = 0,
-    limit: int = 100,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+@router.get("/", response_model=List[JobExpanded], response_model_exclude_unset=True)
+async def read_jobs(
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    expand: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: Principal = Depends(get_current_principal)
 ) -> Any:
-    jobs = db.query(Job).filter(Job.client_id == current_user.id).offset(skip).limit(limit).all()
-    return jobs
+    names = parse_expand(expand, list(JOB_RELATIONS))
+    projection = Projection(Job, JobExpanded, names, JOB_RELATIONS)
+    stmt = paginate(
+        projection.select().where(Job.client_id == current_user.id), Job, limit, cursor, skip
+    )
+    result = await db.execute(stmt)
+    rows = page_rows(result.all(), limit, response)
+    next_cursor = response.headers.get(NEXT_CURSOR_HEADER)
+    return json_response(
+        projection.dump(rows),
+        headers={NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None,
+    )
+
+@router.get("/export")
+async def export_jobs(
+    request: Request,
+    format: Literal["ndjson", "csv"] = "ndjson",
+    expand: Optional[str] = None,
+    current_user: Principal = Depends(get_current_principal)
+) -> StreamingResponse:
+    """
+    All of the current user's jobs, oldest first, streamed as NDJSON or CSV
+    in one response instead of page by page.
+    """
+    names = parse_expand(expand, list(JOB_RELATIONS))
+    projection = Projection(Job, JobExpanded, names, JOB_RELATIONS)
+    stmt = projection.select().where(Job.client_id == current_user.id).order_by(Job.created_at, Job.id)
+    return export_response(request, read_session_factory(request), stmt, projection, format, "jobs")
 
 @router.get("/{job_id}", response_model=JobSchema)
-def read_job(
+async def read_job(
     job_id: int,
-    db: Session = Depends(get_db),
-    current_user: str = Depends(get_current_user)
+    db: AsyncSession = Depends(get_read_db),
+    current_user: Principal = Depends(get_current_principal)
 ) -> Any:
-    db_job = db.query(Job).filter(Job.id == job_id).first()
+    db_job = await db.get(Job, job_id)
     if db_job is None:
         raise HTTPException(status_code=404, detail="Job not found")
     
-    db_user = db.query(User).filter(User.username == current_user).first()
-    if db_job.client_id != db_user.id:
+    if db_job.client_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to view this job")
     
     return db_job
 
 @router.put("/{job_id}/status", response_model=JobSchema)
-def update_job_status(
+async def update_job_status(
     job_id: int,
     status: str,
-    db: Session = Depends(get_db),
-    current_user: str = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal)
 ) -> Any:
-    db_job = db.query(Job).filter(Job.id == job_id).first()
+    result = await db.execute(
+        update(Job)
+        .where(Job.id == job_id, Job.client_id == current_user.id)
+        .values(status=status)
+        .returning(Job)
+    )
+    db_job = result.scalar_one_or_none()
     if db_job is None:
-        raise HTTPException(status_code=404, detail="Job not found")
-    
-    db_user = db.query(User).filter(User.username == current_user).first()
-    if db_job.client_id != db_user.id:
-        raise HTTPException(status_code=403, detail="Not authorized to update this job")
-    
-    db_job.status = status
-    db.commit()
-    db.refresh(db_job)
+        await raise_for_miss(db, Job, job_id, "Job", "update")
+    await db.commit()
     return db_job
 
 @router.delete("/{job_id}")
-def delete_job(
+async def delete_job(
     job_id: int,
-    db: Session = Depends(get_db),
-    current_user: str = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal)
 ) -> Any:
-    db_job = db.query(Job).filter(Job.id == job_id).first()
-    if db_job is None:
-        raise HTTPException(status_code=404, detail="Job not found")
-    
-    db_user = db.query(User).filter(User.username == current_user).first()
-    if db_job.client_id != db_user.id:
-        raise HTTPException(status_code=403, detail="Not authorized to delete this job")
-    
-    db.delete(db_job)
-    db.commit()
+    owned = (Job.id == job_id) & (Job.client_id == current_user.id)
+    # Messages outlive their job, unlinked, as they did with the ORM delete
+    await db.execute(
+        update(Message)
+        .where(Message.job_id == job_id, exists().where(owned))
+        .values(job_id=None)
+    )
+    result = await db.execute(delete(Job).where(owned).returning(Job.id))
+    if result.scalar_one_or_none() is None:
+        await raise_for_miss(db, Job, job_id, "Job", "delete")
+    await db.commit()
     return {"message": "Job deleted successfully"} 
\ No newline at end of file
@@ -1,44 +1,101 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List, Any
+from fastapi import APIRouter, Depends, HTTPException, status, Response, Request, WebSocket, WebSocketDisconnect, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Any, AsyncIterator, Dict, Literal, Optional
+import asyncio
+import json
 
-from ..database import get_db
-from ..models.base import Message, User, Job
-from ..schemas import MessageCreate, Message as MessageSchema
-from ..core.auth import get_current_user
+from ..database import get_async_db, AsyncSessionLocal
+from ..models.base import Message
+from ..schemas import MessageCreate, Message as MessageSchema, MessageExpanded, UserSummary
+from ..core.auth import Principal, authenticate_token, get_current_principal
+from ..core.expand import parse_expand
+from ..core.ownership import ensure_job_participant, raise_for_miss
+from ..core.ratelimit import check_rate_limit
+from ..core.export import export_response
+from ..core.pagination import MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, paginate, page_rows
+from ..core.projection import Projection, json_response
+from ..core.replica import get_read_db, read_session_factory
+from ..core.pubsub import Subscription, hub
 
 router = APIRouter()
 
+# Relations that can be embedded in message listings with ?expand=
+MESSAGE_RELATIONS = {"sender": UserSummary}
+# Messages fetched per query when a stream resumes from a last seen id
+RESUME_PAGE_SIZE = 500
+# Idle streams get a keepalive this often so proxies do not cut them
+KEEPALIVE_SECONDS = 15
+
+def _message_payload(message: Message) -> Dict[str, Any]:
+    return MessageSchema.model_validate(message).model_dump(mode="json")
+
 @router.post("/", response_model=MessageSchema)
-def create_message(
+async def create_message(
     message: MessageCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal)
 ) -> Any:
+    await check_rate_limit(request, "create_message", account=current_user.id)
+    await ensure_job_participant(db, message.job_id, current_user.id)
     db_message = Message(**message.dict(), sender_id=current_user.id)
     db.add(db_message)
-    db.commit()
-    db.refresh(db_message)
+    await db.commit()
+    hub.publish(db_message.job_id, _message_payload(db_message))
     return db_message
 
-@router.get("/job/{job_id}", response_model=List[MessageSchema])
-def read_messages(
+@router.get("/job/{job_id}", response_model=List[MessageExpanded], response_model_exclude_unset=True)
+async def read_messages(
     job_id: int,
-    skip: int = 0,
-    limit: int = 100,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    expand: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: Principal = Depends(get_current_principal)
 ) -> Any:
-    messages = db.query(Message).filter(Message.job_id == job_id).offset(skip).limit(limit).all()
-    return messages
+    await ensure_job_participant(db, job_id, current_user.id)
+    names = parse_expand(expand, list(MESSAGE_RELATIONS))
+    projection = Projection(Message, MessageExpanded, names, MESSAGE_RELATIONS)
+    stmt = paginate(
+        projection.select().where(Message.job_id == job_id), Message, limit, cursor, skip
+    )
+    result = await db.execute(stmt)
+    rows = page_rows(result.all(), limit, response)
+    next_cursor = response.headers.get(NEXT_CURSOR_HEADER)
+    return json_response(
+        projection.dump(rows),
+        headers={NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None,
+    )
+
+@router.get("/job/{job_id}/export")
+async def export_messages(
+    job_id: int,
+    request: Request,
+    format: Literal["ndjson", "csv"] = "ndjson",
+    expand: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: Principal = Depends(get_current_principal)
+) -> StreamingResponse:
+    """The whole message thread of a job, oldest first, streamed as NDJSON or CSV."""
+    await ensure_job_participant(db, job_id, current_user.id)
+    names = parse_expand(expand, list(MESSAGE_RELATIONS))
+    projection = Projection(Message, MessageExpanded, names, MESSAGE_RELATIONS)
+    stmt = projection.select().where(Message.job_id == job_id).order_by(Message.created_at, Message.id)
+    return export_response(
+        request, read_session_factory(request), stmt, projection, format, f"job-{job_id}-messages"
+    )
 
 @router.get("/{message_id}", response_model=MessageSchema)
-def read_message(
+async def read_message(
     message_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_read_db),
+    current_user: Principal = Depends(get_current_principal)
 ) -> Any:
-    db_message = db.query(Message).filter(Message.id == message_id).first()
+    db_message = await db.get(Message, message_id)
     if db_message is None:
         raise HTTPException(status_code=404, detail="Message not found")
     
@@ -48,18 +105,135 @@ def read_message(
     return db_message
 
 @router.delete("/{message_id}")
-def delete_message(
+async def delete_message(
     message_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal)
 ) -> Any:
-    db_message = db.query(Message).filter(Message.id == message_id).first()
-    if db_message is None:
-        raise HTTPException(status_code=404, detail="Message not found")
-    
-    if db_message.sender_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Not authorized to delete this message")
-    
-    db.delete(db_message)
-    db.commit()
-    return {"message": "Message deleted successfully"} 
\ No newline at end of file
+    result = await db.execute(
+        delete(Message)
+        .where(Message.id == message_id, Message.sender_id == current_user.id)
+        .returning(Message.id)
+    )
+    if result.scalar_one_or_none() is None:
+        await raise_for_miss(db, Message, message_id, "Message", "delete")
+    await db.commit()
+    return {"message": "Message deleted successfully"}
+
+async def _authenticate(token: str, job_id: int) -> Principal:
+    # Streams are long-lived, so they must not hold a request-scoped session
+    async with AsyncSessionLocal() as db:
+        principal = await authenticate_token(token, db)
+        await ensure_job_participant(db, job_id, principal.id)
+        return principal
+
+async def _message_feed(
+    subscription: Subscription, last_id: Optional[int]
+) -> AsyncIterator[Optional[Dict[str, Any]]]:
+    """
+    Messages for a subscribed job: first all those after `last_id` (when
+    resuming), paged until caught up, then live ones from the hub, skipping
+    anything already sent. Yields None when the stream has been idle for
+    KEEPALIVE_SECONDS, and ends when the hub drops a subscriber that fell
+    behind, as it may during a long replay; the client then resumes again.
+    """
+    last_sent = last_id or 0
+    while last_id is not None:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(Message)
+                .where(Message.job_id == subscription.job_id, Message.id > last_sent)
+                .order_by(Message.id)
+                .limit(RESUME_PAGE_SIZE)
+            )
+            page = [_message_payload(m) for m in result.scalars().all()]
+        for payload in page:
+            last_sent = payload["id"]
+            yield payload
+        if len(page) < RESUME_PAGE_SIZE:
+            break
+
+    while True:
+        try:
+            payload = await subscription.get(timeout=KEEPALIVE_SECONDS)
+        except asyncio.TimeoutError:
+            yield None
+            continue
+        if payload is None:
+            return
+        if payload["id"] <= last_sent:
+            continue
+        last_sent = payload["id"]
+        yield payload
+
+@router.websocket("/job/{job_id}/ws")
+async def job_messages_ws(
+    websocket: WebSocket,
+    job_id: int,
+    token: str = "",
+    last_id: Optional[int] = None
+) -> None:
+    """
+    Push new messages of a job as JSON frames. Pass the access token as `token`
+    and, when reconnecting, the id of the last message received as `last_id`.
+    """
+    try:
+        await _authenticate(token, job_id)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await websocket.accept()
+
+    # Subscribe before replaying so nothing committed in between is missed
+    subscription = hub.subscribe(job_id)
+
+    async def pump() -> None:
+        async for payload in _message_feed(subscription, last_id):
+            if payload is not None:
+                await websocket.send_json(payload)
+        # Fell behind; the client reconnects with its last id
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+
+    sender = asyncio.create_task(pump())
+    try:
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+        hub.unsubscribe(subscription)
+
+@router.get("/job/{job_id}/stream")
+async def stream_job_messages(
+    job_id: int,
+    request: Request,
+    token: Optional[str] = None,
+    last_id: Optional[int] = None
+) -> StreamingResponse:
+    """
+    Server-sent events fallback for job_messages_ws. The token may come from the
+    Authorization header or the `token` parameter (EventSource cannot set
+    headers); the browser's Last-Event-ID header resumes a dropped stream.
+    """
+    await _authenticate(token or request.headers.get("authorization", ""), job_id)
+    last_event_id = request.headers.get("last-event-id", "")
+    if last_event_id.isdigit():
+        last_id = int(last_event_id)
+
+    async def events() -> AsyncIterator[str]:
+        subscription = hub.subscribe(job_id)
+        try:
+            async for payload in _message_feed(subscription, last_id):
+                if payload is None:
+                    yield ": keepalive\n\n"
+                else:
+                    yield f"id: {payload['id']}\nevent: message\ndata: {json.dumps(payload)}\n\n"
+        finally:
+            hub.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,48 @@
+from fastapi import APIRouter, Response, status
+from fastapi.responses import JSONResponse, PlainTextResponse
+from sqlalchemy import text
+import asyncio
+import logging
+import os
+
+from ..database import async_engine
+from ..core.metrics import pool_status, registry
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# How long the readiness probe waits for a connection and a round trip
+READINESS_TIMEOUT_SECONDS = float(os.getenv("READINESS_TIMEOUT_SECONDS", "2"))
+
+async def _ping_database() -> None:
+    async with async_engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics() -> Response:
+    return PlainTextResponse(
+        registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+@router.get("/health")
+async def health():
+    """Liveness: the process is up and serving requests."""
+    return {"status": "ok"}
+
+@router.get("/ready")
+async def ready() -> Response:
+    """
+    Readiness: a pooled database connection can be checked out and answers
+    within READINESS_TIMEOUT_SECONDS. Reports pool occupancy either way.
+    """
+    pool = pool_status(async_engine.sync_engine.pool)
+    try:
+        await asyncio.wait_for(_ping_database(), READINESS_TIMEOUT_SECONDS)
+    except Exception as e:
+        logger.warning(f"Readiness check failed: {str(e) or type(e).__name__}")
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"status": "unavailable", "database": "unreachable", "pool": pool},
+        )
+    return JSONResponse(content={"status": "ok", "database": "ok", "pool": pool})
@@ -1,29 +1,39 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Request, Response, Query
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Any, Optional
-import os
 from datetime import datetime
-from pathlib import Path
 import logging
 
-from ..database import get_db
-from ..models.base import Service, User
-from ..schemas import ServiceCreate, Service as ServiceSchema
-from ..core.auth import get_current_user
+from ..database import get_async_db
+from ..models.base import Service
+from ..schemas import ServiceCreate, Service as ServiceSchema, ServiceExpanded, UserSummary
+from ..core.auth import Principal, get_current_principal
+from ..core.expand import parse_expand
 from ..core.file_upload import save_uploaded_file
+from ..core.images import enqueue_derivatives
+from ..core.ownership import raise_for_miss
+from ..core.storage import release_blob
+from ..core.pagination import MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, paginate, page_rows
+from ..core.projection import Projection
+from ..core.replica import REPLICA_STICKY_SECONDS, get_read_db
+from ..core.response_cache import ResponseCache, cache_key, make_entry
+from ..core.search import search_services
 
 router = APIRouter()
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
+# Public catalog reads are served from here until a write touches them
+catalog_cache = ResponseCache()
+
+# Relations that can be embedded in the service listing with ?expand=
+SERVICE_RELATIONS = {"owner": UserSummary}
+
 logger = logging.getLogger(__name__)
 
-# Get the absolute path to the uploads directory
-BASE_DIR = Path(__file__).parent.parent
-UPLOAD_DIR = BASE_DIR / "uploads"
-logger.debug(f"Upload directory path: {UPLOAD_DIR}")
-logger.debug(f"Upload directory exists: {UPLOAD_DIR.exists()}")
-logger.debug(f"Upload directory permissions: {os.access(UPLOAD_DIR, os.W_OK)}")
+def _cacheable(db: AsyncSession) -> bool:
+    # Right after a write the replica may not have it yet; caching its answer
+    # would serve the stale copy for the whole cache TTL
+    return not (db.info.get("replica") and catalog_cache.invalidated_within(REPLICA_STICKY_SECONDS))
 
 @router.post("/", response_model=ServiceSchema)
 async def create_service(
@@ -32,14 +42,14 @@ async def create_service(
     price: int = Form(...),
     category: str = Form(...),
     image: Optional[UploadFile] = File(None),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal)
 ) -> Any:
     try:
         # Handle image upload if provided
         image_url = None
         if image:
-            image_url = await save_uploaded_file(image)
+            image_url = await save_uploaded_file(image, db)
             if not image_url:
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
@@ -58,37 +68,98 @@ async def create_service(
         
         db_service = Service(**service_data)
         db.add(db_service)
-        db.commit()
-        db.refresh(db_service)
+        # Thumbnails and WebP/AVIF variants are built by a task worker
+        enqueue_derivatives(db, image_url)
+        await db.commit()
+
+        # New services sort last, so only final listing pages can change
+        catalog_cache.invalidate_tail()
         
         return db_service
         
+    except HTTPException:
+        await db.rollback()
+        raise
     except Exception as e:
         logger.error(f"Error creating service: {str(e)}")
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to create service"
         )
 
-@router.get("/", response_model=List[ServiceSchema])
-def read_services(
-    skip: int = 0,
-    limit: int = 100,
-    db: Session = Depends(get_db)
+@router.get("/", response_model=List[ServiceExpanded], response_model_exclude_unset=True)
+async def read_services(
+    request: Request,
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    expand: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db)
+) -> Any:
+    key = cache_key(request)
+    cached = catalog_cache.get(key)
+    if cached is not None:
+        return cached.to_response(request)
+
+    names = parse_expand(expand, list(SERVICE_RELATIONS))
+    projection = Projection(Service, ServiceExpanded, names, SERVICE_RELATIONS)
+    stmt = paginate(
+        projection.select().where(Service.is_active == True), Service, limit, cursor, skip
+    )
+    result = await db.execute(stmt)
+    services = page_rows(result.all(), limit, response)
+
+    next_cursor = response.headers.get(NEXT_CURSOR_HEADER)
+    entry = make_entry(
+        projection.dump(services),
+        headers={NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None,
+        ids=[service.id for service in services],
+        tail=next_cursor is None,
+        positional=bool(skip) and not cursor,
+    )
+    if _cacheable(db):
+        catalog_cache.put(key, entry)
+    return entry.to_response(request)
+
+@router.get("/search", response_model=List[ServiceSchema])
+async def search_catalog(
+    q: str,
+    response: Response,
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db)
 ) -> Any:
-    services = db.query(Service).filter(Service.is_active == True).offset(skip).limit(limit).all()
-    return services
+    """
+    Full-text search over active services, best matches first. Every word of
+    `q` must match as a prefix of a word in the title, category or description.
+    """
+    rows = await search_services(db, q, limit, cursor)
+    rows = page_rows(rows, limit, response, key=lambda row: (row[1], row[0].id))
+    return [service for service, _ in rows]
 
 @router.get("/{service_id}", response_model=ServiceSchema)
-def read_service(
+async def read_service(
     service_id: int,
-    db: Session = Depends(get_db)
+    request: Request,
+    db: AsyncSession = Depends(get_read_db)
 ) -> Any:
-    db_service = db.query(Service).filter(Service.id == service_id).first()
+    key = cache_key(request)
+    cached = catalog_cache.get(key)
+    if cached is not None:
+        return cached.to_response(request)
+
+    db_service = await db.get(Service, service_id)
     if db_service is None:
         raise HTTPException(status_code=404, detail="Service not found")
-    return db_service
+    entry = make_entry(
+        ServiceSchema.model_validate(db_service).model_dump_json().encode(),
+        ids=[db_service.id],
+    )
+    if _cacheable(db):
+        catalog_cache.put(key, entry)
+    return entry.to_response(request)
 
 @router.put("/{service_id}", response_model=ServiceSchema)
 async def update_service(
@@ -98,60 +169,75 @@ async def update_service(
     price: int = Form(...),
     category: str = Form(...),
     image: Optional[UploadFile] = File(None),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal)
 ) -> Any:
+    owned = (Service.id == service_id) & (Service.owner_id == current_user.id)
     try:
-        db_service = db.query(Service).filter(Service.id == service_id).first()
-        if db_service is None:
-            raise HTTPException(status_code=404, detail="Service not found")
-        
-        if db_service.owner_id != current_user.id:
-            raise HTTPException(status_code=403, detail="Not authorized to update this service")
-        
+        values = {
+            "title": title,
+            "description": description,
+            "price": price,
+            "category": category,
+        }
+
         # Handle image upload if provided
+        image_url = None
+        replaced_url = None
         if image:
-            image_url = await save_uploaded_file(image)
+            # Ownership first, so nobody else's upload ever reaches the disk.
+            # Locked, so concurrent replacements each release the image they overwrote
+            result = await db.execute(select(Service.imageUrl).where(owned).with_for_update())
+            row = result.first()
+            if row is None:
+                await raise_for_miss(db, Service, service_id, "Service", "update")
+            replaced_url = row.imageUrl
+            image_url = await save_uploaded_file(image, db)
             if not image_url:
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail="Invalid image file"
                 )
-            db_service.imageUrl = image_url
-        
-        # Update service data
-        db_service.title = title
-        db_service.description = description
-        db_service.price = price
-        db_service.category = category
-        
-        db.commit()
-        db.refresh(db_service)
+            values["imageUrl"] = image_url
+
+        result = await db.execute(update(Service).where(owned).values(**values).returning(Service))
+        db_service = result.scalar_one_or_none()
+        if db_service is None:
+            await raise_for_miss(db, Service, service_id, "Service", "update")
+        await release_blob(db, replaced_url)
+        enqueue_derivatives(db, image_url)
+        await db.commit()
+
+        catalog_cache.invalidate_ids([db_service.id])
         
         return db_service
         
+    except HTTPException:
+        await db.rollback()
+        raise
     except Exception as e:
         logger.error(f"Error updating service: {str(e)}")
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to update service"
         )
 
 @router.delete("/{service_id}")
-def delete_service(
+async def delete_service(
     service_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal)
 ) -> Any:
-    db_service = db.query(Service).filter(Service.id == service_id).first()
-    if db_service is None:
-        raise HTTPException(status_code=404, detail="Service not found")
-    
-    if db_service.owner_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Not authorized to delete this service")
-    
-    db_service.is_active = False
-    db.commit()
+    result = await db.execute(
+        update(Service)
+        .where(Service.id == service_id, Service.owner_id == current_user.id)
+        .values(is_active=False)
+        .returning(Service.id)
+    )
+    if result.scalar_one_or_none() is None:
+        await raise_for_miss(db, Service, service_id, "Service", "delete")
+    await db.commit()
+    catalog_cache.invalidate_ids([service_id])
     return {"message": "Service deleted successfully"} 
 
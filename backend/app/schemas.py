@@ -1,7 +1,8 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, computed_field
 from typing import Optional, List, Literal
 from datetime import datetime
 from .models.base import UserRole
+from .core.images import thumbnail_url
 
 # Define the role type to match the enum values
 UserRoleType = Literal['admin', 'subcontractor', 'client']
@@ -25,6 +26,15 @@ class User(UserBase):
     class Config:
         from_attributes = True
 
+class UserSummary(BaseModel):
+    id: int
+    username: str
+    full_name: Optional[str] = None
+    role: UserRole
+
+    class Config:
+        from_attributes = True
+
 class Token(BaseModel):
     access_token: str
     token_type: str
@@ -49,9 +59,28 @@ class Service(ServiceBase):
     created_at: datetime
     updated_at: datetime
 
+    @computed_field
+    @property
+    def thumbnailUrl(self) -> Optional[str]:
+        return thumbnail_url(self.imageUrl)
+
+    class Config:
+        from_attributes = True
+
+class ServiceSummary(BaseModel):
+    id: int
+    title: str
+    category: str
+    price: int
+
     class Config:
         from_attributes = True
 
+# Related objects embedded on request with ?expand=; left unset otherwise so
+# they are omitted from the response rather than serialized as null.
+class ServiceExpanded(Service):
+    owner: Optional[UserSummary] = None
+
 class JobBase(BaseModel):
     title: str
     description: str
@@ -70,6 +99,10 @@ class Job(JobBase):
     class Config:
         from_attributes = True
 
+class JobExpanded(Job):
+    service: Optional[ServiceSummary] = None
+    client: Optional[UserSummary] = None
+
 class MessageBase(BaseModel):
     content: str
     job_id: int
@@ -83,4 +116,7 @@ class Message(MessageBase):
     created_at: datetime
 
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True
+
+class MessageExpanded(Message):
+    sender: Optional[UserSummary] = None
@@ -0,0 +1,351 @@
+"""
+Offline load test for the API.
+
+Starts the app under uvicorn against a throwaway database (a fresh SQLite file
+by default, or any --database-url such as a local Postgres) and a temporary
+upload directory, seeds it through the API, then drives the auth, services,
+jobs, messages and upload endpoints with concurrent clients for a fixed
+duration. Throughput and p50/p95/p99
+latency per route are written as JSON and compared against a stored baseline;
+the exit status is 1 when any route regressed beyond the tolerance.
+
+Requires httpx (pip install httpx) in addition to the app's requirements.
+
+Usage (from the backend directory):
+    python bench/loadtest.py [--duration 20] [--concurrency 16] [--output results.json]
+    python bench/loadtest.py --save-baseline      # record bench/baseline.json
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+import httpx
+from PIL import Image
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baseline.json"
+PASSWORD = "loadtest-password"
+
+# Relative share of requests per route during the measured phase
+ROUTE_WEIGHTS = {
+    "POST /auth/token": 1,
+    "GET /auth/me": 4,
+    "GET /services/": 10,
+    "GET /services/{id}": 8,
+    "GET /services/search": 4,
+    "POST /services/ (upload)": 1,
+    "GET /jobs/": 6,
+    "POST /jobs/": 2,
+    "GET /messages/job/{id}": 8,
+    "POST /messages/": 4,
+}
+
+class Fixture:
+    """Ids and tokens created while seeding, shared by the client tasks."""
+
+    def __init__(self):
+        self.users: List[Dict[str, Any]] = []
+        self.service_ids: List[int] = []
+        self.job_ids: Dict[int, List[int]] = {}
+        self.image = _sample_image()
+
+    def user(self) -> Dict[str, Any]:
+        return random.choice(self.users)
+
+def _sample_image() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (640, 480), (40, 120, 200)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _auth(user: Dict[str, Any]) -> Dict[str, str]:
+    return {"Authorization": f"Bearer {user['token']}"}
+
+def start_server(database_url: str, port: int, log_path: Path, env_overrides: Dict[str, str]) -> subprocess.Popen:
+    env = dict(os.environ, DATABASE_URL=database_url, **env_overrides)
+    # Keep uploads made under load out of the real upload tree
+    env["UPLOAD_DIR"] = str(log_path.parent / "uploads")
+    # The database is throwaway, so build the schema straight from the models
+    env["DB_CREATE_ALL"] = "1"
+    # The load comes from one address at rates no real client reaches
+    env["RATE_LIMITING"] = "false"
+    env.pop("ASYNC_DATABASE_URL", None)
+    log = open(log_path, "wb")
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app",
+         "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+
+async def wait_until_ready(client: httpx.AsyncClient, server: subprocess.Popen, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError("Server exited during startup; see its log")
+        try:
+            if (await client.get("/")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("Server did not become ready")
+
+async def seed(client: httpx.AsyncClient, args: argparse.Namespace) -> Fixture:
+    fixture = Fixture()
+    for i in range(args.users):
+        email = f"bench{i}@example.com"
+        r = await client.post("/auth/register", json={
+            "email": email, "username": f"bench{i}", "full_name": f"Bench User {i}",
+            "role": "client", "password": PASSWORD,
+        })
+        r.raise_for_status()
+        user_id = r.json()["id"]
+        r = await client.post("/auth/token", data={"email": email, "password": PASSWORD})
+        r.raise_for_status()
+        fixture.users.append({"id": user_id, "email": email, "token": r.json()["access_token"]})
+
+    words = ["plumbing", "garden", "cleaning", "painting", "moving", "repair", "tutoring", "electrical"]
+    for i in range(args.services):
+        owner = fixture.users[i % len(fixture.users)]
+        word = words[i % len(words)]
+        r = await client.post("/services/", headers=_auth(owner), data={
+            "title": f"{word.title()} service {i}",
+            "description": f"Reliable {word} by a local professional, listing {i}.",
+            "price": 20 + i % 200,
+            "category": word,
+        })
+        r.raise_for_status()
+        fixture.service_ids.append(r.json()["id"])
+
+    for user in fixture.users:
+        fixture.job_ids[user["id"]] = []
+        for j in range(args.jobs_per_user):
+            r = await client.post("/jobs/", headers=_auth(user), json={
+                "title": f"Job {j}", "description": "Seeded job",
+                "service_id": random.choice(fixture.service_ids),
+            })
+            r.raise_for_status()
+            job_id = r.json()["id"]
+            fixture.job_ids[user["id"]].append(job_id)
+            for m in range(args.messages_per_job):
+                r = await client.post("/messages/", headers=_auth(user), json={
+                    "content": f"Seeded message {m}", "job_id": job_id,
+                })
+                r.raise_for_status()
+    return fixture
+
+def build_routes(fixture: Fixture) -> Dict[str, Callable[[httpx.AsyncClient], Any]]:
+    """Route label -> coroutine function issuing one request for it."""
+
+    def login(client):
+        user = fixture.user()
+        return client.post("/auth/token", data={"email": user["email"], "password": PASSWORD})
+
+    def me(client):
+        return client.get("/auth/me", headers=_auth(fixture.user()))
+
+    def list_services(client):
+        return client.get("/services/", params={"limit": 20})
+
+    def read_service(client):
+        return client.get(f"/services/{random.choice(fixture.service_ids)}")
+
+    def search_services(client):
+        return client.get("/services/search", params={"q": random.choice(["plumb", "garden", "repair local"])})
+
+    def upload_service(client):
+        return client.post(
+            "/services/", headers=_auth(fixture.user()),
+            data={"title": "Bench upload", "description": "Upload path", "price": "10", "category": "bench"},
+            files={"image": ("bench.png", fixture.image, "image/png")},
+        )
+
+    def list_jobs(client):
+        return client.get("/jobs/", headers=_auth(fixture.user()), params={"limit": 20})
+
+    def create_job(client):
+        return client.post("/jobs/", headers=_auth(fixture.user()), json={
+            "title": "Bench job", "description": "Created under load",
+            "service_id": random.choice(fixture.service_ids),
+        })
+
+    def _user_job() -> Tuple[Dict[str, Any], int]:
+        user = fixture.user()
+        return user, random.choice(fixture.job_ids[user["id"]])
+
+    def list_messages(client):
+        user, job_id = _user_job()
+        return client.get(f"/messages/job/{job_id}", headers=_auth(user), params={"limit": 50})
+
+    def create_message(client):
+        user, job_id = _user_job()
+        return client.post("/messages/", headers=_auth(user), json={"content": "Under load", "job_id": job_id})
+
+    return {
+        "POST /auth/token": login,
+        "GET /auth/me": me,
+        "GET /services/": list_services,
+        "GET /services/{id}": read_service,
+        "GET /services/search": search_services,
+        "POST /services/ (upload)": upload_service,
+        "GET /jobs/": list_jobs,
+        "POST /jobs/": create_job,
+        "GET /messages/job/{id}": list_messages,
+        "POST /messages/": create_message,
+    }
+
+async def run_load(
+    client: httpx.AsyncClient,
+    routes: Dict[str, Callable[[httpx.AsyncClient], Any]],
+    concurrency: int,
+    duration: float,
+) -> Tuple[Dict[str, List[float]], Dict[str, int], float]:
+    labels = list(routes)
+    weights = [ROUTE_WEIGHTS[label] for label in labels]
+    latencies: Dict[str, List[float]] = {label: [] for label in labels}
+    errors: Dict[str, int] = {label: 0 for label in labels}
+    deadline = time.monotonic() + duration
+
+    async def worker():
+        while time.monotonic() < deadline:
+            label = random.choices(labels, weights)[0]
+            start = time.perf_counter()
+            try:
+                response = await routes[label](client)
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            if ok:
+                latencies[label].append(elapsed_ms)
+            else:
+                errors[label] += 1
+
+    started = time.monotonic()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.monotonic() - started
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+def summarize(latencies: Dict[str, List[float]], errors: Dict[str, int], elapsed: float) -> Dict[str, Dict[str, float]]:
+    summary = {}
+    for label, samples in latencies.items():
+        stats = {"requests": len(samples), "errors": errors[label], "rps": round(len(samples) / elapsed, 2)}
+        if samples:
+            stats.update({
+                "mean_ms": round(statistics.fmean(samples), 2),
+                "p50_ms": round(percentile(samples, 50), 2),
+                "p95_ms": round(percentile(samples, 95), 2),
+                "p99_ms": round(percentile(samples, 99), 2),
+            })
+        summary[label] = stats
+    return summary
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Describe every route whose p95 rose, or throughput fell, by more than `tolerance`."""
+    regressions = []
+    for label, base in baseline["routes"].items():
+        current = results["routes"].get(label)
+        if not current or "p95_ms" not in current or "p95_ms" not in base:
+            continue
+        if current["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{label}: p95 {base['p95_ms']}ms -> {current['p95_ms']}ms")
+        if current["rps"] < base["rps"] * (1 - tolerance):
+            regressions.append(f"{label}: throughput {base['rps']} -> {current['rps']} req/s")
+        if current["errors"] > base["errors"]:
+            regressions.append(f"{label}: errors {base['errors']} -> {current['errors']}")
+    return regressions
+
+async def main_async(args: argparse.Namespace) -> int:
+    workdir = Path(tempfile.mkdtemp(prefix="taskconnect-bench-"))
+    database_url = args.database_url or f"sqlite:///{workdir / 'bench.db'}"
+    port = args.port or _free_port()
+    env_overrides = {}
+    if args.bcrypt_rounds:
+        env_overrides = {"BCRYPT_ROUNDS": str(args.bcrypt_rounds), "BCRYPT_MIN_ROUNDS": str(args.bcrypt_rounds)}
+
+    server = start_server(database_url, port, workdir / "server.log", env_overrides)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    try:
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=30
+        ) as client:
+            await wait_until_ready(client, server)
+            fixture = await seed(client, args)
+            routes = build_routes(fixture)
+            # Warm connections, caches and the pool before measuring
+            await run_load(client, routes, args.concurrency, min(2.0, args.duration))
+            latencies, errors, elapsed = await run_load(client, routes, args.concurrency, args.duration)
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+    results = {
+        "duration_s": round(elapsed, 2),
+        "concurrency": args.concurrency,
+        "database": database_url.split(":", 1)[0],
+        "python": platform.python_version(),
+        "total_rps": round(sum(len(s) for s in latencies.values()) / elapsed, 2),
+        "routes": summarize(latencies, errors, elapsed),
+    }
+    output = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+    print(output)
+
+    if args.save_baseline:
+        args.baseline.write_text(output + "\n")
+        print(f"Baseline written to {args.baseline}", file=sys.stderr)
+        return 0
+    if not args.baseline.exists():
+        print(f"No baseline at {args.baseline}; run with --save-baseline to record one", file=sys.stderr)
+        return 0
+
+    regressions = compare(results, json.loads(args.baseline.read_text()), args.tolerance)
+    for line in regressions:
+        print(f"REGRESSION {line}", file=sys.stderr)
+    return 1 if regressions else 0
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="Sync SQLAlchemy URL of a throwaway database (default: fresh SQLite file)")
+    parser.add_argument("--port", type=int, help="Port for the app server (default: any free port)")
+    parser.add_argument("--duration", type=float, default=20, help="Seconds of measured load")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent clients")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--services", type=int, default=300)
+    parser.add_argument("--jobs-per-user", type=int, default=5)
+    parser.add_argument("--messages-per-job", type=int, default=10)
+    parser.add_argument("--bcrypt-rounds", type=int, default=4,
+                        help="bcrypt cost for the run; 0 keeps the app's own setting")
+    parser.add_argument("--output", help="Also write the JSON results to this file")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="Record this run as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed relative slowdown before a route counts as regressed")
+    parser.add_argument("--seed", type=int, default=1234, help="Random seed for the request mix")
+    args = parser.parse_args()
+    random.seed(args.seed)
+    return asyncio.run(main_async(args))
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+"""
+Check that every listing query the routers issue is served by an index.
+
+Builds the same statements as the jobs, messages and services routers (first
+page and cursor page), runs EXPLAIN on each against DATABASE_URL and fails if
+the plan does not use the index added for it. Postgres prefers a sequential
+scan on small tables, so seq scans are disabled for the session: the check is
+whether the index is usable, not whether the planner picks it at today's size.
+
+    python bench/query_plans.py
+"""
+from datetime import datetime
+import os
+import sys
+from typing import List, Tuple
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from sqlalchemy import Select, select
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from app.core.pagination import encode_cursor, paginate
+from app.database import engine
+from app.models.base import Base, Job, Message, Service
+
+class Explain(Executable, ClauseElement):
+    inherit_cache = False
+
+    def __init__(self, statement: Select, prefix: str):
+        self.statement = statement
+        self.prefix = prefix
+
+@compiles(Explain)
+def _compile_explain(element, compiler, **kw):
+    return f"{element.prefix} {compiler.process(element.statement, **kw)}"
+
+def router_queries() -> List[Tuple[str, Select, str]]:
+    """(label, statement, index the plan must use) for each hot listing query."""
+    cursor = encode_cursor(datetime.utcnow(), 1)
+    queries = []
+    for label, page_cursor in (("first page", None), ("cursor page", cursor)):
+        queries += [
+            (
+                f"read_jobs {label}",
+                paginate(select(Job).where(Job.client_id == 1), Job, 100, page_cursor),
+                "ix_jobs_client_id_created_at_id",
+            ),
+            (
+                f"read_messages {label}",
+                paginate(select(Message).where(Message.job_id == 1), Message, 100, page_cursor),
+                "ix_messages_job_id_created_at_id",
+            ),
+            (
+                f"read_services {label}",
+                paginate(select(Service).where(Service.is_active == True), Service, 100, page_cursor),
+                "ix_services_active_created_at_id",
+            ),
+        ]
+    queries.append((
+        "message stream resume",
+        select(Message).where(Message.job_id == 1, Message.id > 0).order_by(Message.id).limit(500),
+        "ix_messages_job_id_created_at_id",
+    ))
+    return queries
+
+def main() -> int:
+    dialect = engine.dialect.name
+    if dialect not in ("postgresql", "sqlite"):
+        print(f"Unsupported dialect: {dialect}")
+        return 2
+
+    failures = 0
+    with engine.connect() as conn:
+        if dialect == "sqlite":
+            # Local SQLite databases are usually built by create_all
+            Base.metadata.create_all(bind=conn)
+            prefix = "EXPLAIN QUERY PLAN"
+        else:
+            conn.exec_driver_sql("SET enable_seqscan = off")
+            prefix = "EXPLAIN"
+
+        for label, statement, index in router_queries():
+            rows = conn.execute(Explain(statement, prefix)).all()
+            plan = "\n".join(str(row[-1]) for row in rows)
+            ok = index in plan
+            failures += not ok
+            print(f"{'ok  ' if ok else 'FAIL'} {label}: expected {index}")
+            if not ok:
+                print("     " + plan.replace("\n", "\n     "))
+
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
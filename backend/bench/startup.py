@@ -0,0 +1,126 @@
+"""
+Measure how long a worker takes to come up.
+
+Reports, over several runs, the time to import app.main in a fresh
+interpreter and the time from spawning uvicorn until /health answers (the
+lifespan has finished: pool warmed, statements prepared) and until /ready
+confirms the database. The schema is created once up front so the runs
+measure a normal restart, not first-time setup.
+
+Requires httpx (pip install httpx) in addition to the app's requirements.
+
+Usage (from the backend directory):
+    python bench/startup.py [--runs 5] [--database-url sqlite:////tmp/x.db]
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+IMPORT_SNIPPET = (
+    "import time; start = time.perf_counter(); import app.main; "
+    "print(time.perf_counter() - start)"
+)
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _summary(samples: List[float]) -> Dict[str, float]:
+    return {
+        "median_ms": round(statistics.median(samples) * 1000, 1),
+        "min_ms": round(min(samples) * 1000, 1),
+        "max_ms": round(max(samples) * 1000, 1),
+    }
+
+def measure_import(env: Dict[str, str]) -> float:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET],
+        cwd=BACKEND_DIR, env=env, check=True, capture_output=True, text=True,
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+def wait_for(url: str, deadline: float, server: subprocess.Popen) -> None:
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError("Server exited during startup")
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.005)
+    raise RuntimeError(f"Timed out waiting for {url}")
+
+def measure_server(env: Dict[str, str], timeout: float) -> Dict[str, float]:
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+    start = time.monotonic()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app",
+         "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_for(f"{base}/health", start + timeout, server)
+        healthy = time.monotonic() - start
+        wait_for(f"{base}/ready", start + timeout, server)
+        ready = time.monotonic() - start
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+    return {"health": healthy, "ready": ready}
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--database-url", help="Sync SQLAlchemy URL (default: a fresh SQLite file)")
+    parser.add_argument("--timeout", type=float, default=60, help="Seconds to wait for each server")
+    parser.add_argument("--output", help="Also write the JSON results to this file")
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="taskconnect-startup-"))
+    env = dict(
+        os.environ,
+        DATABASE_URL=args.database_url or f"sqlite:///{workdir / 'startup.db'}",
+        UPLOAD_DIR=str(workdir / "uploads"),
+    )
+    env.pop("ASYNC_DATABASE_URL", None)
+    env.setdefault("BCRYPT_ROUNDS", "12")
+
+    # One-time schema setup, excluded from the measurements
+    subprocess.run(
+        [sys.executable, "-c", "import asyncio; from app.database import init_db; asyncio.run(init_db())"],
+        cwd=BACKEND_DIR, env=env, check=True,
+    )
+
+    imports = [measure_import(env) for _ in range(args.runs)]
+    servers = [measure_server(env, args.timeout) for _ in range(args.runs)]
+
+    results = {
+        "runs": args.runs,
+        "database": env["DATABASE_URL"].split(":", 1)[0],
+        "import_app": _summary(imports),
+        "until_healthy": _summary([s["health"] for s in servers]),
+        "until_ready": _summary([s["ready"] for s in servers]),
+    }
+    output = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+    print(output)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
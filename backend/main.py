@@ -1,62 +1,7 @@
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from dotenv import load_dotenv
-import os
-from pathlib import Path
+"""
+Entry point for `uvicorn main:app` from the backend directory. The application
+itself is built by app.main.create_app, so both entry points serve the same app.
+"""
+from app.main import create_app
 
-from app.routers import auth, services, jobs, messages
-from app.database import engine
-from app.models.base import Base
-
-# Load environment variables
-load_dotenv()
-
-# Create database tables
-Base.metadata.create_all(bind=engine)
-
-# Get the absolute path to the uploads directory
-BASE_DIR = Path(__file__).parent
-UPLOAD_DIR = BASE_DIR / "uploads"
-
-# Create FastAPI app
-app = FastAPI(
-    title="TaskConnect API",
-    description="Backend API for TaskConnect platform",
-    version="1.0.0"
-)
-
-# Configure CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=[
-        "http://localhost:3000",
-        "http://127.0.0.1:3000",
-        "http://localhost:8080",
-        "http://127.0.0.1:8080",
-        "http://localhost:5173",  # Vite default port
-        "http://127.0.0.1:5173",
-        "http://localhost:4173",  # Vite preview port
-        "http://127.0.0.1:4173",
-        "http://localhost:5000",
-        "http://127.0.0.1:5000"
-    ],
-    allow_credentials=True,
-    allow_methods=["*"],  # Allow all methods
-    allow_headers=["*"],  # Allow all headers
-    expose_headers=["*"],
-    max_age=3600,  # Cache preflight requests for 1 hour
-)
-
-# Mount static files directory
-app.mount("/uploads", StaticFiles(directory=str(UPLOAD_DIR)), name="uploads")
-
-# Include routers
-app.include_router(auth.router, prefix="/auth", tags=["auth"])
-app.include_router(services.router, prefix="/services", tags=["services"])
-app.include_router(jobs.router, prefix="/jobs", tags=["jobs"])
-app.include_router(messages.router, prefix="/messages", tags=["messages"])
-
-@app.get("/")
-async def root():
-    return {"message": "Welcome to TaskConnect API"} 
\ No newline at end of file
+app = create_app()
@@ -0,0 +1,126 @@
+"""
+One-off migration of legacy flat /uploads/<uuid>.ext images into the
+content-addressed upload store.
+
+Each distinct file referenced by Service.imageUrl is hashed and linked into
+uploads/ab/cd/<sha256>.ext, duplicates collapse into one blob with a
+reference count, and the service rows are rewritten to the new URLs.
+Old files are only removed after the database changes are committed.
+
+Usage (from the backend directory):
+    python scripts/migrate_uploads.py [--dry-run] [--skip-derivatives]
+"""
+import argparse
+import hashlib
+import logging
+import os
+import shutil
+import sys
+from pathlib import Path
+from typing import Dict, Tuple
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from app.database import SessionLocal
+from app.models.base import Service, UploadBlob
+from app.core.file_upload import CHUNK_SIZE, sniff_extension
+from app.core.images import DERIVATIVE_FORMATS, DERIVATIVE_WIDTHS, derivative_path, generate_derivatives
+from app.core.storage import UPLOAD_DIR, blob_relpath, blob_url, parse_blob_url
+
+logger = logging.getLogger("migrate_uploads")
+
+def hash_file(path: Path) -> Tuple[str, int, str]:
+    """Return the SHA-256, size and sniffed extension of a file."""
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as f:
+        head = f.read(CHUNK_SIZE)
+        chunk = head
+        while chunk:
+            digest.update(chunk)
+            size += len(chunk)
+            chunk = f.read(CHUNK_SIZE)
+    return digest.hexdigest(), size, sniff_extension(head) or path.suffix.lower()
+
+def link_or_copy(source: Path, target: Path) -> None:
+    target.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
+
+def migrate(dry_run: bool = False, skip_derivatives: bool = False) -> None:
+    db = SessionLocal()
+    migrated: Dict[str, str] = {}  # legacy file name -> new URL
+    blobs: Dict[str, UploadBlob] = {}
+    created = []
+    missing = 0
+    try:
+        services = db.query(Service).filter(Service.imageUrl.like("/uploads/%")).all()
+        for service in services:
+            if parse_blob_url(service.imageUrl):
+                continue
+            name = service.imageUrl[len("/uploads/"):]
+            if name not in migrated:
+                source = UPLOAD_DIR / name
+                if "/" in name or not source.is_file():
+                    logger.warning(f"Service {service.id} references missing file {service.imageUrl}")
+                    missing += 1
+                    continue
+                digest, size, extension = hash_file(source)
+                relpath = blob_relpath(digest, extension)
+                if digest not in blobs:
+                    blob = db.get(UploadBlob, digest)
+                    if blob is None:
+                        blob = UploadBlob(digest=digest, path=relpath, size=size, ref_count=0)
+                        db.add(blob)
+                    blobs[digest] = blob
+                target = UPLOAD_DIR / relpath
+                if not dry_run and not target.exists():
+                    link_or_copy(source, target)
+                    created.append(target)
+                migrated[name] = blob_url(digest, extension)
+                blobs[digest].ref_count += 1
+            else:
+                blobs[parse_blob_url(migrated[name])].ref_count += 1
+            service.imageUrl = migrated[name]
+
+        if dry_run:
+            db.rollback()
+        else:
+            db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    logger.info(
+        f"{len(migrated)} files into {len(blobs)} blobs, {missing} missing"
+        + (" (dry run, nothing changed)" if dry_run else "")
+    )
+    if dry_run:
+        return
+
+    # The rows now point at the new paths, so the flat files can go
+    for name in migrated:
+        legacy = UPLOAD_DIR / name
+        for width in DERIVATIVE_WIDTHS:
+            for fmt, _ in DERIVATIVE_FORMATS:
+                derivative_path(legacy, width, fmt).unlink(missing_ok=True)
+        legacy.unlink(missing_ok=True)
+
+    if not skip_derivatives:
+        for target in created:
+            try:
+                generate_derivatives(str(target))
+            except Exception as e:
+                logger.error(f"Could not build derivatives for {target}: {str(e)}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--dry-run", action="store_true", help="report without changing anything")
+    parser.add_argument("--skip-derivatives", action="store_true", help="do not rebuild image variants")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    migrate(dry_run=args.dry_run, skip_derivatives=args.skip_derivatives)
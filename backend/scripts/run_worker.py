@@ -0,0 +1,49 @@
+"""
+Run a background task worker.
+
+Claims due tasks from the task_queue table and runs them, within each task
+type's concurrency limit, until SIGINT or SIGTERM; tasks already running
+are allowed to finish. Start as many workers as needed, on any host that
+can reach the database and the upload directory.
+
+Usage (from the backend directory):
+    python scripts/run_worker.py [--kinds images.derivatives,uploads.collect] [--name worker-1]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.database import async_engine
+from app.core import images, storage  # noqa: F401  (register their task types)
+from app.core.storage import ensure_upload_dir
+from app.core.tasks import Worker, registry
+
+async def main(kinds, name) -> None:
+    ensure_upload_dir()
+    worker = Worker(kinds=kinds, name=name)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    try:
+        await worker.run(stop)
+    finally:
+        await async_engine.dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--kinds", help=f"comma separated task types (default: all of {', '.join(registry)})")
+    parser.add_argument("--name", help="worker name recorded on claimed tasks (default: host:pid)")
+    args = parser.parse_args()
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper())
+    kinds = [kind.strip() for kind in args.kinds.split(",") if kind.strip()] if args.kinds else None
+    asyncio.run(main(kinds, args.name))
@@ -26,7 +26,7 @@ export const ServiceCard: React.FC<ServiceCardProps> = ({ service }) => {
     }
     
     // If it's a relative URL, prepend the backend URL
-    const fullUrl = url.startsWith('/uploads/') 
+    const fullUrl = url.startsWith('/uploads/') || url.startsWith('/images/')
       ? `${backendUrl}${url}`
       : `${backendUrl}/uploads/${url}`;
     
@@ -46,7 +46,7 @@ export const ServiceCard: React.FC<ServiceCardProps> = ({ service }) => {
         <div className="aspect-w-16 aspect-h-9 mb-4 bg-gray-100 rounded-md overflow-hidden">
           {service.imageUrl ? (
             <img 
-              src={getImageUrl(service.imageUrl)} 
+              src={getImageUrl(service.thumbnailUrl || service.imageUrl)} 
               alt={service.title}
               className="w-full h-48 object-cover"
               onError={(e) => {
@@ -25,6 +25,7 @@ export interface Service {
   postedBy: string; // Reference to admin who posted it
   postedDate: string; // ISO date string
   imageUrl?: string;
+  thumbnailUrl?: string;
   estimatedHours?: number;
   skills?: string[];
 }